@@ -1,9 +1,27 @@
+import time
+_IMPORT_STARTED = time.perf_counter()  # 启动计时起点（--startup-profile 的“导入模块”阶段）
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
+from tkinter import font as tkfont
 import os
 import sys
+import bisect
+import collections
+import fnmatch
+import itertools
+import json
+import builtins
 import io
+import re
+import codecs
+import queue
+import shutil
+import signal
+import tempfile
+import textwrap
+import threading
 import traceback
+import zlib
 from keyword import iskeyword  # 用于Python关键字判断（语法高亮）
 
 # 仿VSCode深色主题配色（全平台兼容，微调更贴合原版）
@@ -20,51 +38,1593 @@ COLOR_FG_KEYWORD = "#569CD6"# 关键字色（VSCode原版蓝）
 COLOR_FG_STRING = "#CE9178"  # 字符串色（VSCode原版橙红）
 COLOR_FG_COMMENT = "#6A9955"# 注释色（VSCode原版绿）
 COLOR_FG_NUMBER = "#B5CEA8" # 数字色（VSCode原版浅绿）
+COLOR_FG_BUILTIN = "#4EC9B0" # 内置函数/类型色（VSCode原版青绿）
+COLOR_FG_DECORATOR = "#DCDCAA" # 装饰器色（VSCode原版浅黄）
+COLOR_FG_WARNING = "#CCA700"  # 警告色（VSCode原版黄）
 COLOR_SELECT = "#007ACC"     # 选中背景色
+COLOR_FIND_MATCH = "#613214" # 查找匹配背景色（VSCode原版）
+COLOR_FIND_CURRENT = "#515C6A" # 当前查找匹配背景色
+COLOR_FG_LINK = "#3794FF"    # 控制台链接色
 COLOR_BTN = "#007ACC"        # 按钮背景色
 COLOR_CURSOR = "#FFFFFF"     # 编辑区光标色
 
-class HCodeEditorWithRun:
+# ========== 语法高亮引擎（增量 + 可见区域优先） ==========
+# 单遍词法分析器：按行扫描，跨行的字符串（三引号 / 反斜杠续行）通过行尾状态衔接。
+# 标准库 tokenize 只能从文件开头整体扫描，无法从缓存的中间状态续扫，因此这里用等价的逐行规则实现。
+_CODE_RE = re.compile(r"""
+    (?P<comment>\#.*)
+  | (?P<string>(?P<prefix>(?i:rb|br|fr|rf|b|r|u|f))?(?P<quote>\"\"\"|'''|"|'))
+  | (?P<number>0[xX][0-9a-fA-F_]+|0[bB][01_]+|0[oO][0-7_]+
+      |(?:\d[\d_]*(?:\.[\d_]*)?|\.\d[\d_]*)(?:[eE][+-]?\d[\d_]*)?[jJ]?)
+  | (?P<name>[^\W\d]\w*)
+""", re.VERBOSE)
+_DECORATOR_RE = re.compile(r"[ \t]*(@[^\W\d][\w.]*)")
+_BUILTINS = frozenset(name for name in dir(builtins) if not name.startswith("_") and not iskeyword(name))
+
+
+def _scan_fstring_field(line, pos, end):
+    """扫描f-string中 { 之后的替换字段，返回 (表达式结束位置, 右花括号位置)"""
+    depth = 0
+    expr_end = None
+    i = pos
+    while i < end:
+        c = line[i]
+        if c in "\"'":
+            close = line.find(c, i + 1, end)
+            i = end if close == -1 else close + 1
+            continue
+        if c in "([{":
+            depth += 1
+        elif c in ")]}":
+            if depth == 0 and c == "}":
+                return (i if expr_end is None else expr_end), i
+            depth = max(depth - 1, 0)
+        elif depth == 0 and expr_end is None and (c == ":" or (c == "!" and line[i + 1:i + 2] != "=")):
+            expr_end = i  # 之后是转换符/格式说明，按字符串着色
+        i += 1
+    return (end if expr_end is None else expr_end), end
+
+
+def _scan_string(line, pos, end, quote, fmt, start, spans):
+    """从 pos 开始扫描字符串主体，返回 (扫描结束位置, 行尾状态)"""
+    i = pos
+    seg_start = start
+    while i < end:
+        c = line[i]
+        if c == "\\":
+            i += 2
+            continue
+        if line.startswith(quote, i):
+            i += len(quote)
+            spans.append(("string", seg_start, i))
+            return i, None
+        if fmt and c == "{":
+            if line.startswith("{{", i):
+                i += 2
+                continue
+            spans.append(("string", seg_start, i + 1))
+            expr_end, close = _scan_fstring_field(line, i + 1, end)
+            _lex_code(line, i + 1, expr_end, spans)
+            seg_start = expr_end
+            i = close + 1
+            continue
+        i += 1
+    if seg_start < end:
+        spans.append(("string", seg_start, end))
+    # 三引号字符串或行尾反斜杠续行：字符串延续到下一行
+    if len(quote) == 3 or i > end:
+        return end, (quote, fmt)
+    return end, None
+
+
+def _lex_code(line, pos, end, spans):
+    """扫描普通代码区间 [pos, end)，返回 (扫描结束位置, 行尾状态)"""
+    while True:
+        m = _CODE_RE.search(line, pos, end)
+        if not m:
+            return end, None
+        kind = m.lastgroup
+        start, pos = m.span()
+        if kind == "string":
+            fmt = "f" in (m.group("prefix") or "").lower()
+            pos, state = _scan_string(line, pos, end, m.group("quote"), fmt, start, spans)
+            if state:
+                return end, state
+        elif kind == "name":
+            word = m.group()
+            if iskeyword(word):
+                spans.append(("keyword", start, pos))
+            elif word in _BUILTINS:
+                spans.append(("builtin", start, pos))
+        else:
+            spans.append((kind, start, pos))
+
+
+def _lex_line(line, state):
+    """对单行做词法分析，返回 (高亮区间列表, 行尾状态)
+
+    state 为 None 表示行首处于普通代码中，否则为 (引号, 是否f-string)，表示行首仍在未闭合的字符串内。
+    """
+    spans = []
+    pos = 0
+    end = len(line)
+    if state:
+        pos, state = _scan_string(line, 0, end, state[0], state[1], 0, spans)
+        if state:
+            return spans, state
+    else:
+        m = _DECORATOR_RE.match(line)
+        if m:
+            spans.append(("decorator", m.start(1), m.end(1)))
+            pos = m.end()
+    pos, state = _lex_code(line, pos, end, spans)
+    return spans, state
+
+
+class TextEditProxy:
+    """拦截Text组件的insert/delete/replace命令，把每次修改的行范围通知给监听者
+
+    监听者签名：listener(first_line, last_line, line_delta)，行号为修改后的坐标。
+    recorder 不为 None 时，每次修改后另外回调 recorder(changes)，changes 为修改的具体内容
+    [("i", 行, 列, 插入的文本)] / [("d", 行, 列, 删除的文本)]（位置为修改前的坐标），
+    无法描述的修改（如一次删除多个区间）报告为 [("s", 1, 0, 修改后的全文)]。
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.listeners = []
+        self.recorder = None
+        self._orig = widget._w + "_orig"
+        widget.tk.call("rename", widget._w, self._orig)
+        widget.tk.createcommand(widget._w, self._dispatch)
+
+    def close(self):
+        """还原原始组件命令（组件销毁前调用）"""
+        self.widget.tk.deletecommand(self.widget._w)
+        self.widget.tk.call("rename", self._orig, self.widget._w)
+
+    def _line_of(self, index):
+        return int(str(self.widget.tk.call(self._orig, "index", index)).split(".")[0])
+
+    def _describe(self, op, args):
+        """在修改执行前记录其具体内容；无法描述时返回 None"""
+        call = lambda *a: self.widget.tk.call((self._orig,) + a)
+
+        def position(index):
+            # Tk 不会修改末尾自动添加的换行符，超出 end-1c 的位置按 end-1c 处理
+            index = str(call("index", index))
+            if call("compare", index, ">", "end-1c"):
+                index = str(call("index", "end-1c"))
+            line, column = index.split(".")
+            return int(line), int(column)
+
+        changes = []
+        if op in ("delete", "replace"):
+            if op == "delete" and len(args) > 3:
+                return None
+            first = position(args[1])
+            last = position(args[2]) if len(args) > 2 else position(f"{args[1]}+1c")
+            if first < last:
+                changes.append(("d", *first, str(call("get", "%d.%d" % first, "%d.%d" % last))))
+        if op in ("insert", "replace"):
+            start = position(args[1])
+            text = "".join(str(chunk) for chunk in args[(2 if op == "insert" else 3)::2])
+            if text:
+                changes.append(("i", *start, text))
+        return changes
+
+    def _dispatch(self, *args):
+        op = args[0] if args else ""
+        # Tk内置撤销已关闭（undo=False），撤销/重做由 UndoLog 经 insert/delete 重放，同样在这里拦截
+        if op not in ("insert", "delete", "replace"):
+            return self.widget.tk.call((self._orig,) + args)
+        try:
+            first = self._line_of(args[1])
+            total_before = self._line_of("end-1c")
+            changes = self._describe(op, args) if self.recorder is not None else []
+        except tk.TclError:
+            return self.widget.tk.call((self._orig,) + args)
+        result = self.widget.tk.call((self._orig,) + args)
+        if changes is None:
+            changes = [("s", 1, 0, str(self.widget.tk.call(self._orig, "get", "1.0", "end-1c")))]
+        if changes:
+            self.recorder(changes)
+        # insert index chars ?tags chars tags...? / replace i1 i2 chars ?tags chars...?
+        chunks = args[2::2] if op == "insert" else args[3::2] if op == "replace" else ()
+        added = sum(str(chunk).count("\n") for chunk in chunks)
+        delta = self._line_of("end-1c") - total_before
+        for listener in self.listeners:
+            listener(first, first + added, delta)
+        return result
+
+
+class EditScheduler:
+    """编辑事件调度器：订阅<<Modified>>，把一帧内的连续修改合并成一次更新
+
+    TextEditProxy 报告的每次修改先合并为一个脏行范围，<<Modified>> 触发后经 debounce_ms
+    延迟统一分发给各消费者：consumer(first_line, last_line, line_delta)。
+    """
+
+    DEBOUNCE_MS = 16  # 默认约一帧
+
+    def __init__(self, text, proxy, debounce_ms=DEBOUNCE_MS):
+        self.text = text
+        self.debounce_ms = debounce_ms
+        self.consumers = []
+        self.first = None  # 合并后的脏行范围（修改后的行号坐标）
+        self.last = None
+        self.delta = 0
+        self._job = None
+        # 统计计数：收到的事件数 / 合并进已排队更新的事件数 / 丢弃（无需更新）的事件数 / 实际分发次数
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushes = 0
+        proxy.listeners.append(self._on_edit)
+        text.bind("<<Modified>>", self._on_modified, add="+")
+
+    def _on_edit(self, first, last, delta):
+        """合并一次修改：已有范围中位于修改点之后的行按 delta 平移"""
+        if self.first is None:
+            self.first, self.last = first, last
+        else:
+            if self.first > first:
+                self.first = max(self.first + delta, first)
+            if self.last > first:
+                self.last = max(self.last + delta, first)
+            self.first = min(self.first, first)
+            self.last = max(self.last, last)
+        self.delta += delta
+
+    def _on_modified(self, event=None):
+        if not self.text.edit_modified():
+            return  # 重置修改标志时产生的事件
+        self.text.edit_modified(False)
+        self.received += 1
+        if self.first is None:
+            self.dropped += 1
+        elif self._job is not None:
+            self.coalesced += 1
+        else:
+            self._job = self.text.after(self.debounce_ms, self.flush)
+
+    def flush(self):
+        """立即分发合并后的脏行范围（程序化批量修改后也可直接调用）"""
+        if self._job is not None:
+            self.text.after_cancel(self._job)
+            self._job = None
+        if self.first is None:
+            return
+        first, last, delta = self.first, self.last, self.delta
+        self.first = self.last = None
+        self.delta = 0
+        self.flushes += 1
+        for consumer in self.consumers:
+            consumer(first, last, delta)
+
+    def stats(self):
+        """返回事件计数，用于衡量合并效果"""
+        return {"received": self.received, "coalesced": self.coalesced,
+                "dropped": self.dropped, "flushes": self.flushes}
+
+
+class SyntaxHighlighter:
+    """增量语法高亮：按行缓存词法状态与token列表，只重新高亮被修改的行
+
+    - 每行行尾的词法状态缓存在 states 中（三引号字符串可能跨行），token列表缓存在 tokens 中
+    - 修改后的行记入 dirty；若某行行尾状态变化，则继续向下传播，直到状态收敛
+    - 先处理可见区域，屏幕外的行在空闲时分批（after_idle）处理
+    - viewport_only 为真时（大文件模式）只处理可见区域，跨行字符串状态可能不精确
+    """
+
+    TAGS = ("keyword", "builtin", "decorator", "string", "comment", "number")
+    CHUNK_LINES = 300       # 每个空闲批次最多处理的行数
+    CHUNK_SECONDS = 0.01    # 每个空闲批次的时间预算
+    BULK_EDIT_LINES = 1000  # 超过该行数的修改直接按“从此行往后全部失效”处理
+    _UNKNOWN = object()     # 新插入行的占位状态，保证与任何真实状态都不相等
+
+    def __init__(self, text):
+        self.text = text
+        self.states = [None]  # states[i] 为第 i+1 行行尾状态
+        self.tokens = [[]]    # tokens[i] 为第 i+1 行的 (标签, 起始列, 结束列) 列表
+        self.dirty = set()    # 需要重新高亮的零散行
+        self.stale_from = 1   # 该行及之后的所有行都需要重新高亮
+        self.viewport_only = False  # 大文件模式：只高亮可见区域，屏幕外不做后台处理
+        self._job = None
+
+    def _line_count(self):
+        return int(self.text.index("end-1c").split(".")[0])
+
+    def on_edit(self, first, last, delta):
+        """EditScheduler回调：平移缓存的行状态，并标记被修改的行"""
+        if delta > 0:
+            self.states[first - 1:first - 1] = [self._UNKNOWN] * delta
+            self.tokens[first - 1:first - 1] = [self._UNKNOWN] * delta
+        elif delta < 0:
+            del self.states[first - 1:first - 1 - delta]
+            del self.tokens[first - 1:first - 1 - delta]
+        # 被修改的行上原有标签已不可信，必须重新打标签
+        self.tokens[first - 1:last] = [self._UNKNOWN] * (last - first + 1)
+        if delta:
+            self.dirty = {max(d + delta, first) if d > first else d for d in self.dirty}
+            if self.stale_from > first:
+                self.stale_from = max(first, self.stale_from + delta)
+        if last - first > self.BULK_EDIT_LINES:
+            self.stale_from = min(self.stale_from, first)
+        else:
+            self.dirty.update(range(first, last + 1))
+        self.schedule()
+
+    def invalidate_all(self):
+        """整篇重新高亮（如打开文件后）"""
+        self.states = [self._UNKNOWN] * self._line_count()
+        self.tokens = [self._UNKNOWN] * len(self.states)
+        self.dirty.clear()
+        self.stale_from = 1
+        self.schedule()
+
+    def schedule(self):
+        """请求一次高亮处理（已有待执行任务时不重复注册）"""
+        if self._job is None:
+            self._job = self.text.after_idle(self._run)
+
+    def cancel(self):
+        """取消尚未执行的高亮任务（组件销毁前调用）"""
+        if self._job is not None:
+            self.text.after_cancel(self._job)
+            self._job = None
+
+    def _visible_range(self):
+        first = int(self.text.index("@0,0").split(".")[0])
+        last = int(self.text.index(f"@0,{self.text.winfo_height()}").split(".")[0])
+        return first, last
+
+    def _needs(self, line):
+        if line in self.dirty:
+            return True
+        if line < self.stale_from:
+            return False
+        # 仅可见区域模式下不做顺序重算，已打过标签的行不再重复处理
+        return not self.viewport_only or self.tokens[line - 1] is self._UNKNOWN
+
+    def _run(self):
+        self._job = None
+        line_count = self._line_count()
+        if len(self.states) != line_count:
+            return  # 还有修改未经 EditScheduler 分发，等 on_edit 到达后会重新调度
+        self.dirty = {d for d in self.dirty if d <= line_count}
+        # 1. 可见区域优先
+        first, last = self._visible_range()
+        for line in range(first, min(last, line_count) + 1):
+            if self._needs(line):
+                self._relex(line)
+        if self.viewport_only:
+            return
+        # 2. 屏幕外的行按顺序分批处理
+        deadline = time.perf_counter() + self.CHUNK_SECONDS
+        budget = self.CHUNK_LINES
+        while budget > 0 and time.perf_counter() < deadline:
+            pending = [d for d in self.dirty if d < self.stale_from]
+            line = min(pending) if pending else self.stale_from
+            if line > line_count:
+                break
+            while budget > 0 and line <= line_count and self._needs(line):
+                self._relex(line)
+                budget -= 1
+                line += 1
+        if self.dirty or self.stale_from <= line_count:
+            self._job = self.text.after_idle(self._run)
+
+    def _relex(self, line):
+        """重新分析单行；token未变化时跳过打标签，行尾状态变化时把下一行标记为待处理"""
+        entry = self.states[line - 2] if line > 1 else None
+        if entry is self._UNKNOWN:
+            entry = None
+        content = self.text.get(f"{line}.0", f"{line}.end")
+        spans, state = _lex_line(content, entry)
+        if spans != self.tokens[line - 1]:
+            for tag in self.TAGS:
+                self.text.tag_remove(tag, f"{line}.0", f"{line}.end")
+            for tag, start, end in spans:
+                self.text.tag_add(tag, f"{line}.{start}", f"{line}.{end}")
+            self.tokens[line - 1] = spans
+        old = self.states[line - 1]
+        self.states[line - 1] = state
+        self.dirty.discard(line)
+        if line == self.stale_from:
+            self.stale_from += 1
+        elif state != old and line + 1 < self.stale_from:
+            self.dirty.add(line + 1)
+
+
+class LineIndex:
+    """文本的行首偏移索引：字符偏移与 (行, 列) 的换算用二分查找完成，不必重新扫描文本"""
+
+    def __init__(self, text):
+        self.starts = [0]
+        self.starts.extend(m.end() for m in re.finditer("\n", text))
+
+    def position(self, offset):
+        """字符偏移 -> (行号(从1开始), 列号)"""
+        line = bisect.bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1]
+
+    def offset(self, line, column):
+        """(行号, 列号) -> 字符偏移"""
+        line = min(max(line, 1), len(self.starts))
+        return self.starts[line - 1] + column
+
+    def line_text(self, text, line):
+        end = self.starts[line] - 1 if line < len(self.starts) else len(text)
+        return text[self.starts[line - 1]:end]
+
+
+class FileSearchIndex:
+    """跨文件搜索用的行偏移索引缓存：按 (mtime, 大小) 判断文件是否变化，重复搜索时复用"""
+
+    MAX_ENTRIES = 2000
+
+    def __init__(self):
+        self._cache = collections.OrderedDict()  # 路径 -> (mtime_ns, 大小, LineIndex)
+        self._lock = threading.Lock()
+
+    def get(self, path, stat, text):
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached and cached[:2] == key:
+                self._cache.move_to_end(path)
+                return cached[2]
+        index = LineIndex(text)
+        with self._lock:
+            self._cache[path] = key + (index,)
+            while len(self._cache) > self.MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        return index
+
+    def search(self, path, pattern, max_results):
+        """在单个文件中搜索，返回 [(行号, 列号, 行内容)]；无法按UTF-8解码的文件视为二进制跳过"""
+        stat = os.stat(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except (UnicodeDecodeError, OSError):
+            return []
+        index = None
+        results = []
+        last_line = 0
+        for m in pattern.finditer(text):
+            index = index or self.get(path, stat, text)
+            line, column = index.position(m.start())
+            if line != last_line:  # 同一行只报告一次
+                results.append((line, column, index.line_text(text, line).strip()))
+                last_line = line
+                if len(results) >= max_results:
+                    break
+        return results
+
+
+class LineNumberGutter:
+    """行号栏：用Canvas只绘制可见区域内的行号，顶行/行数不变时不重绘"""
+
+    PAD_X = 6  # 行号左右留白（像素）
+
+    def __init__(self, master, font):
+        self.text = None  # 当前显示的编辑组件（切换标签页时通过 attach 更换）
+        self.font = tkfont.Font(font=font)
+        self.canvas = tk.Canvas(master, bg=COLOR_BG_SIDEBAR, bd=0, highlightthickness=0,
+                                width=self._width_for(1))
+        self._digits = 1
+        self._view_key = None  # 上次绘制时的 (顶行, 顶行y坐标, 总行数, 高度)
+        self.markers = {}      # 行号 -> (级别, 信息)：语法检查结果标记
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+
+    def attach(self, text, markers=None):
+        """切换到另一个编辑组件并立即重绘"""
+        self.text = text
+        self.markers = markers or {}
+        self._view_key = None
+        self.redraw()
+
+    def set_markers(self, markers):
+        """更新语法检查标记并重绘"""
+        self.markers = markers
+        self.redraw(force=True)
+
+    def _width_for(self, digits):
+        return self.font.measure("0" * max(digits, 2)) + 2 * self.PAD_X
+
+    def redraw(self, force=False):
+        """按当前可见范围重绘行号；视图未变化时直接返回"""
+        text = self.text
+        if text is None:
+            return
+        top = int(text.index("@0,0").split(".")[0])
+        line_count = int(text.index("end-1c").split(".")[0])
+        info = text.dlineinfo(f"{top}.0")
+        key = (top, info[1] if info else 0, line_count, self.canvas.winfo_height())
+        if key == self._view_key and not force:
+            return
+        self._view_key = key
+        # 行号位数变化时调整栏宽
+        digits = len(str(line_count))
+        if digits != self._digits:
+            self._digits = digits
+            self.canvas.config(width=self._width_for(digits))
+        x = self._width_for(digits) - self.PAD_X
+        self.canvas.delete("all")
+        line = top
+        while line <= line_count:
+            info = text.dlineinfo(f"{line}.0")
+            if info is None:
+                break
+            self.canvas.create_text(x, info[1], anchor=tk.NE, text=str(line),
+                                    fill=COLOR_FG_TEXT, font=self.font)
+            if line in self.markers:
+                color = COLOR_FG_ERROR if self.markers[line][0] == "error" else COLOR_FG_WARNING
+                self.canvas.create_rectangle(1, info[1] + 1, 4, info[1] + info[3] - 1, fill=color, width=0)
+            line += 1
+
+
+# ========== 后台语法检查 ==========
+def _check_source(source, filename):
+    """检查一段Python代码，返回诊断列表 [(行, 起始列, 结束列或None, 级别, 信息)]，级别为 error / warning
+
+    先用 compile() 检查语法错误；没有语法错误且安装了 pyflakes 时，再检查未定义名称、未使用的导入等。
+    定义在模块级，便于在子进程（ProcessPoolExecutor）中执行。
+    """
+    import ast  # 延迟导入（启动时用不到，首次检查时才导入）
+    try:
+        tree = ast.parse(source, filename)
+        compile(tree, filename, "exec", dont_inherit=True)  # ast.parse 不检查 return 在函数外等错误
+    except SyntaxError as e:
+        column = max((e.offset or 1) - 1, 0)
+        end = getattr(e, "end_offset", None)
+        end = end - 1 if end and getattr(e, "end_lineno", None) == e.lineno and end - 1 > column else None
+        return [(e.lineno or 1, column, end, "error", e.msg)]
+    except (ValueError, RecursionError) as e:  # 含空字符 / 嵌套过深
+        return [(1, 0, None, "error", str(e))]
+    try:
+        from pyflakes import checker  # 可选依赖
+    except ImportError:
+        return []
+    messages = sorted(checker.Checker(tree, filename=filename).messages, key=lambda m: (m.lineno, m.col))
+    return [(m.lineno, m.col, None, "warning", m.message % m.message_args) for m in messages]
+
+
+class SyntaxChecker:
+    """语法检查结果缓存：按内容哈希缓存诊断结果，内容未变化（如撤销回原样、切回标签页）时直接复用
+
+    check() 在后台线程调用；传入 pool 时在子进程中检查（compile 全程持有GIL，大文件在线程中检查仍会卡住界面）。
+    """
+
+    CACHE_SIZE = 64
+    PROCESS_CHARS = 512 * 1024  # 超过该长度的代码在子进程中检查
+
+    def __init__(self):
+        self._cache = collections.OrderedDict()  # 内容哈希 -> 诊断列表
+        self._lock = threading.Lock()
+
+    def check(self, source, filename, pool=None):
+        import hashlib  # 延迟导入
+        key = hashlib.sha1(f"{filename}\0{source}".encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        if pool is not None:
+            diagnostics = pool.submit(_check_source, source, filename).result()
+        else:
+            diagnostics = _check_source(source, filename)
+        with self._lock:
+            self._cache[key] = diagnostics
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return diagnostics
+
+
+# ========== 代码运行引擎（独立子进程） ==========
+# 子进程引导代码：以用户文件名编译缓冲区内容，使报错信息/回溯显示真实文件名与源码行
+_RUN_BOOTSTRAP = r"""
+import sys, os, linecache, traceback
+path, filename = sys.argv[1], sys.argv[2]
+profile_path = sys.argv[3] if len(sys.argv) > 3 else ""
+trace_memory = len(sys.argv) > 4 and sys.argv[4] == "1"
+with open(path, encoding="utf-8") as f:
+    source = f.read()
+linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+sys.argv = [filename]
+sys.path[0] = os.path.dirname(os.path.abspath(filename))
+profiler = None
+if profile_path:
+    import cProfile
+    profiler = cProfile.Profile()
+if trace_memory:
+    import tracemalloc
+    tracemalloc.start()
+try:
+    code = compile(source, filename, "exec")
+    if profiler is not None:
+        profiler.enable()
+    try:
+        exec(code, {"__name__": "__main__", "__file__": filename, "__builtins__": __builtins__})
+    finally:
+        if profiler is not None:
+            profiler.disable()
+except SystemExit:
+    raise
+except BaseException:
+    etype, value, tb = sys.exc_info()
+    traceback.print_exception(etype, value, tb.tb_next)
+    sys.exit(1)
+finally:
+    if trace_memory:
+        # 先于 dump_stats 取内存数据，避免把性能统计导出本身的分配计入
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    if profiler is not None:
+        profiler.dump_stats(profile_path)
+    if trace_memory:
+        import cProfile, pstats
+        snapshot = snapshot.filter_traces(
+            [tracemalloc.Filter(False, "<string>"), tracemalloc.Filter(False, tracemalloc.__file__),
+             tracemalloc.Filter(False, cProfile.__file__), tracemalloc.Filter(False, pstats.__file__)])
+        sys.stdout.write(f"\n[tracemalloc] 当前 {current / 1048576:.2f} MB | 峰值 {peak / 1048576:.2f} MB\n")
+        for stat in snapshot.statistics("lineno")[:10]:
+            frame = stat.traceback[0]
+            sys.stdout.write(f"  {frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KB（{stat.count} 次分配）\n")
+"""
+
+
+def _python_executable():
+    """运行用户代码所用的解释器；打包成可执行文件后 sys.executable 不是Python，改用PATH中的python"""
+    if getattr(sys, "frozen", False):
+        return shutil.which("python3") or shutil.which("python") or "python"
+    return sys.executable
+
+
+class CodeRunner:
+    """在独立Python进程中运行代码，不阻塞界面、不污染编辑器自身的状态
+
+    后台线程读取子进程的 stdout/stderr，按 (流名称, 内容) 放入 queue；进程结束后放入
+    ("exit", (退出码, 统计信息))。Tk 主循环通过 after() 定时取出队列内容。
+    """
+
+    READ_SIZE = 8192
+    READER_GRACE = 1.0  # 进程结束后等待读取线程读完剩余输出的时长（子进程启动的后台进程可能一直占用管道）
+
+    def __init__(self):
+        self.proc = None
+        self.queue = queue.Queue()
+        self._script = None
+        self._started = 0.0
+
+    @property
+    def running(self):
+        return self.proc is not None and self.proc.returncode is None
+
+    def start(self, source, filename, cwd=None, profile_path=None, trace_memory=False):
+        """把缓冲区内容写入临时文件并启动子进程
+
+        profile_path 非空时在 cProfile 下运行并把统计数据导出到该文件；
+        trace_memory 为真时用 tracemalloc 跟踪内存分配，结束时输出峰值与分配最多的代码行。
+        """
+        import subprocess  # 延迟导入（第一次运行代码时才需要）
+        fd, self._script = tempfile.mkstemp(prefix="hcode_run_", suffix=".py")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(source)
+        env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1")
+        self.queue = queue.Queue()  # 每次运行使用新队列，上次运行残留的输出不会混入
+        self._started = time.perf_counter()
+        self.proc = subprocess.Popen(
+            [_python_executable(), "-u", "-c", _RUN_BOOTSTRAP, self._script, filename,
+             profile_path or "", "1" if trace_memory else "0"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=cwd, env=env,
+        )
+        readers = [threading.Thread(target=self._read, args=(self.proc.stdout, "stdout"), daemon=True),
+                   threading.Thread(target=self._read, args=(self.proc.stderr, "stderr"), daemon=True)]
+        for reader in readers:
+            reader.start()
+        threading.Thread(target=self._wait, args=(self.proc, readers), daemon=True).start()
+
+    def stop(self):
+        """终止正在运行的子进程"""
+        if self.running:
+            # Popen.kill() 先 poll() 再发信号，不会误杀已被回收后复用的PID；
+            # 若 poll() 抢先回收了子进程，_wait 退回 proc.wait()（此时拿不到CPU时间与峰值内存）
+            self.proc.kill()
+
+    def _read(self, pipe, stream):
+        out = self.queue  # 进程结束后仍未读完的输出留在本次运行的队列中
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = pipe.read1(self.READ_SIZE)
+            if not data:
+                break
+            out.put((stream, decoder.decode(data)))
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            out.put((stream, tail))
+        pipe.close()
+
+    def _wait(self, proc, readers):
+        out = self.queue
+        stats = {"wall": None, "cpu": None, "peak_rss": None}
+        try:
+            if not hasattr(os, "wait4"):
+                raise ChildProcessError
+            # wait4 可同时拿到该子进程的 CPU 时间与峰值内存
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            stats["cpu"] = usage.ru_utime + usage.ru_stime
+            # Linux 下 ru_maxrss 单位为KB，macOS 下为字节
+            stats["peak_rss"] = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+        except ChildProcessError:  # 不支持 wait4，或子进程已被回收
+            proc.wait()
+        stats["wall"] = time.perf_counter() - self._started
+        # 先等进程结束再等读取线程：子进程留下的后台进程继承了输出管道时，读取线程可能一直读不到结尾
+        deadline = time.monotonic() + self.READER_GRACE
+        for reader in readers:
+            reader.join(max(deadline - time.monotonic(), 0))
+        try:
+            os.remove(self._script)
+        except OSError:
+            pass
+        out.put(("exit", (proc.returncode, stats)))
+
+
+# 持久内核引导代码：长期运行，从 stdin 逐行读取JSON请求，在同一个命名空间中执行，
+# 已导入的模块与变量在多次运行之间保留。每次执行结束后在 stdout 和 stderr 上各写一个结束标记，
+# 编辑器两条流都收到标记才算结束，保证报错信息不会落在结束提示之后。
+_KERNEL_BOOTSTRAP = r"""
+import sys, os, json, linecache, traceback
+marker = "\x00HCODE:" + sys.argv[1] + ":"
+requests = sys.stdin.buffer
+sys.stdin = open(os.devnull, encoding="utf-8")  # 用户代码的 input() 不能读到请求通道
+namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+while True:
+    try:
+        raw = requests.readline()
+    except KeyboardInterrupt:
+        continue  # 空闲时收到中断信号，忽略
+    if not raw:
+        break
+    request = json.loads(raw)
+    filename = request["filename"]
+    linecache.cache[filename] = (len(request["full"]), None, request["full"].splitlines(True), filename)
+    namespace["__file__"] = filename
+    sys.argv = [filename]
+    sys.path[0] = os.path.dirname(os.path.abspath(filename))
+    if request["cwd"]:
+        os.chdir(request["cwd"])
+    status = 0
+    try:
+        # 前面补空行，使回溯中的行号与编辑区一致
+        code = compile("\n" * (request["line"] - 1) + request["source"], filename, "exec")
+        exec(code, namespace)
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        etype, value, tb = sys.exc_info()
+        traceback.print_exception(etype, value, tb.tb_next)
+        status = 1
+    for stream in (sys.stdout, sys.stderr):
+        stream.write(f"{marker}{status}\n")
+        stream.flush()
+"""
+
+_CELL_RE = re.compile(r"#\s*%%")
+
+
+def _split_cells(source):
+    """按 # %% 标记把代码切分为单元格，返回 [(起始行号, 代码)]；标记行属于它后面的单元格"""
+    cells = []
+    start, lines = 1, []
+    for number, line in enumerate(source.split("\n"), 1):
+        if lines and _CELL_RE.match(line):
+            cells.append((start, "\n".join(lines)))
+            start, lines = number, []
+        lines.append(line)
+    cells.append((start, "\n".join(lines)))
+    return cells
+
+
+class KernelRunner(CodeRunner):
+    """持久内核：一个长期运行的Python进程，多次执行共享导入的模块和全局变量
+
+    execute() 把一段代码发送给内核；代码执行完毕后队列中依次出现 stdout 与 stderr 的
+    ("mark", (流名称, 退出状态))。内核进程退出（崩溃/重启）时放入 ("exit", (退出码, 统计信息))。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.busy = False
+        self._marker = None
+
+    def ensure_started(self):
+        if self.running:
+            return
+        import subprocess  # 延迟导入
+        token = os.urandom(8).hex()  # 结束标记中带随机串，避免与用户输出混淆
+        self._marker = f"\x00HCODE:{token}:"
+        env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1")
+        self.busy = False
+        self.queue = queue.Queue()  # 旧内核残留的输出不再显示
+        self.proc = subprocess.Popen(
+            [_python_executable(), "-u", "-c", _KERNEL_BOOTSTRAP, token],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+        )
+        readers = [threading.Thread(target=self._read, args=(self.proc.stdout, "stdout"), daemon=True),
+                   threading.Thread(target=self._read, args=(self.proc.stderr, "stderr"), daemon=True)]
+        for reader in readers:
+            reader.start()
+        threading.Thread(target=self._wait, args=(self.proc, readers), daemon=True).start()
+
+    def execute(self, source, filename, line=1, full="", cwd=None):
+        """在内核中执行一段代码；line 为这段代码在文件中的起始行号，full 为完整文件内容（用于回溯显示源码）"""
+        self.ensure_started()
+        request = {"source": source, "filename": filename, "line": line, "full": full, "cwd": cwd}
+        self.busy = True
+        self._started = time.perf_counter()
+        self.proc.stdin.write(json.dumps(request).encode("utf-8") + b"\n")
+        self.proc.stdin.flush()
+
+    def interrupt(self):
+        """中断正在执行的代码并保留内核状态；不支持 SIGINT 的平台只能终止内核"""
+        if not self.running:
+            return
+        if sys.platform == "win32":
+            self.proc.kill()
+        else:
+            self.proc.send_signal(signal.SIGINT)
+
+    def _read(self, pipe, stream):
+        marker = self._marker
+        out = self.queue  # 重启后旧内核（或其后台进程）残留的输出不会进入新内核的队列
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        while True:
+            data = pipe.read1(self.READ_SIZE)
+            pending += decoder.decode(data, final=not data)
+            while True:
+                start = pending.find(marker)
+                end = pending.find("\n", start) if start >= 0 else -1
+                if end < 0:
+                    break
+                if start:
+                    out.put((stream, pending[:start]))
+                out.put(("mark", (stream, int(pending[start + len(marker):end]))))
+                pending = pending[end + 1:]
+            # 末尾可能是被读取截断的结束标记，留到下次拼接
+            keep = pending.rfind("\x00") if data else -1
+            tail = pending[keep:] if keep >= 0 else ""
+            if tail and (marker.startswith(tail) or tail.startswith(marker)):
+                output, pending = pending[:keep], tail
+            else:
+                output, pending = pending, ""
+            if output:
+                out.put((stream, output))
+            if not data:
+                break
+        pipe.close()
+
+    def _wait(self, proc, readers):
+        out = self.queue
+        # 与 CodeRunner._wait 相同：先等进程结束，再限时等读取线程（代码启动的后台进程可能一直占用管道）
+        proc.wait()
+        if proc is self.proc:
+            self.busy = False
+        deadline = time.monotonic() + self.READER_GRACE
+        for reader in readers:
+            reader.join(max(deadline - time.monotonic(), 0))
+        out.put(("exit", (proc.returncode, {"wall": time.perf_counter() - self._started,
+                                            "cpu": None, "peak_rss": None})))
+
+
+class ConsoleSink:
+    """控制台输出缓冲：写入先进入内存，最多每 FLUSH_MS 毫秒批量刷新一次到Text组件
+
+    - 按流（stdout/stderr）决定标签，不再逐次扫描错误关键词
+    - 控制台最多保留 max_lines 行，超出后裁掉最旧的行
+    - spill_to_disk 为真时，被裁掉的内容追加到临时文件，可随时导出完整输出
+    """
+
+    FLUSH_MS = 30
+    THREAD_FLUSH_MS = 100  # 非主线程的写入不能安排 after 任务，由主线程定时检查
+    MAX_LINES = 10000
+
+    def __init__(self, widget, max_lines=MAX_LINES):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.spill_to_disk = True
+        self._pending = []  # [(标签, [文本片段])]：相同标签的连续写入追加到同一个列表，刷新时再拼接
+        self._lock = threading.Lock()
+        self._job = None
+        self._spill = None  # 被裁掉内容的临时文件
+        self.widget.after(self.THREAD_FLUSH_MS, self._flush_threads)
+
+    def write(self, text, tag=None):
+        """追加输出（可在任意线程调用；非主线程写入由主线程定时刷新）"""
+        if not text:
+            return
+        with self._lock:
+            if self._pending and self._pending[-1][0] == tag:
+                self._pending[-1][1].append(text)
+            else:
+                self._pending.append((tag, [text]))
+        if self._job is None and threading.current_thread() is threading.main_thread():
+            self._job = self.widget.after(self.FLUSH_MS, self.flush)
+
+    def _flush_threads(self):
+        if self._pending and self._job is None:
+            self.flush()
+        self.widget.after(self.THREAD_FLUSH_MS, self._flush_threads)
+
+    def flush(self):
+        """把缓冲的输出一次性写入控制台并裁剪超出上限的旧行"""
+        self._job = None
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        args = []
+        for tag, chunks in pending:
+            args.extend(("".join(chunks), tag or ()))
+        self.widget.config(state=tk.NORMAL)
+        self.widget.insert(tk.END, *args)
+        self._trim()
+        self.widget.config(state=tk.DISABLED)
+        self.widget.yview(tk.END)  # 自动滚动到最后一行
+
+    def _trim(self):
+        # 超出上限 10% 后才裁剪，避免每次刷新都删除
+        line_count = int(self.widget.index("end-1c").split(".")[0])
+        if line_count <= self.max_lines * 1.1:
+            return
+        cut = f"{line_count - self.max_lines + 1}.0"
+        if self.spill_to_disk:
+            if self._spill is None:
+                self._spill = tempfile.TemporaryFile("w+", encoding="utf-8")
+            self._spill.write(self.widget.get("1.0", cut))
+        self.widget.delete("1.0", cut)
+
+    def save(self, path):
+        """导出完整输出：磁盘上已裁掉的部分 + 控制台当前内容"""
+        self.flush()
+        with open(path, "w", encoding="utf-8") as f:
+            if self._spill is not None:
+                self._spill.seek(0)
+                shutil.copyfileobj(self._spill, f)
+                self._spill.seek(0, os.SEEK_END)
+            f.write(self.widget.get("1.0", "end-1c"))
+
+    def clear(self):
+        """清空控制台与所有缓冲"""
+        with self._lock:
+            self._pending = []
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self.widget.config(state=tk.NORMAL)
+        self.widget.delete("1.0", tk.END)
+        self.widget.config(state=tk.DISABLED)
+
+
+class ConsoleStream:
+    """替代 sys.stdout / sys.stderr 的文件对象，写入转发给 ConsoleSink"""
+
+    def __init__(self, sink, tag=None):
+        self.sink = sink
+        self.tag = tag
+
+    def write(self, text):
+        self.sink.write(text, self.tag)
+        return len(text)
+
+    def flush(self):
+        """兼容标准输出协议（实际刷新由 ConsoleSink 定时完成）"""
+        pass
+
+
+class WorkspaceScanner:
+    """工作区目录扫描：按需（展开时）用 os.scandir 列出单层目录，结果按目录 mtime 缓存
+
+    忽略规则：内置目录名（版本库/缓存/虚拟环境等）、含 pyvenv.cfg 的虚拟环境目录，
+    以及工作区根目录 .gitignore 中的模式（不支持子目录中的 .gitignore）。
+    """
+
+    IGNORED_NAMES = frozenset({".git", ".hg", ".svn", "__pycache__", ".mypy_cache", ".pytest_cache",
+                               ".ruff_cache", ".tox", ".nox", ".venv", "venv", "node_modules", ".idea"})
+
     def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._cache = {}  # 目录路径 -> (mtime_ns, 条目列表)
+        self._ignore_mtime = None
+        self._patterns = []  # [(模式, 是否取反, 仅目录, 是否按相对路径匹配)]
+        self.reload_ignore()
+
+    def reload_ignore(self):
+        """根目录 .gitignore 变化时重新读取规则，返回是否发生变化"""
+        path = os.path.join(self.root, ".gitignore")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._ignore_mtime:
+            return False
+        self._ignore_mtime = mtime
+        self._patterns = []
+        if mtime is not None:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    negate = line.startswith("!")
+                    line = line.lstrip("!")
+                    dir_only = line.endswith("/")
+                    line = line.rstrip("/")
+                    anchored = "/" in line
+                    self._patterns.append((line.lstrip("/"), negate, dir_only, anchored))
+        self._cache.clear()
+        return True
+
+    def is_ignored(self, path, name, is_dir):
+        if name in self.IGNORED_NAMES:
+            return True
+        if is_dir and os.path.exists(os.path.join(path, "pyvenv.cfg")):
+            return True
+        rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+        ignored = False
+        for pattern, negate, dir_only, anchored in self._patterns:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch.fnmatch(rel if anchored else name, pattern):
+                ignored = not negate
+        return ignored
+
+    def changed(self, path):
+        """目录内容自上次列出后是否可能变化（依据目录 mtime）"""
+        cached = self._cache.get(path)
+        try:
+            return cached is None or os.stat(path).st_mtime_ns != cached[0]
+        except OSError:
+            return True
+
+    def list_dir(self, path):
+        """列出单层目录：返回 [(名称, 路径, 是否目录)]，目录在前；mtime 未变时直接返回缓存"""
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if not self.is_ignored(entry.path, entry.name, is_dir):
+                    entries.append((entry.name, entry.path, is_dir))
+        entries.sort(key=lambda e: (not e[2], e[0].casefold()))
+        self._cache[path] = (mtime, entries)
+        return entries
+
+
+# ========== 撤销日志 + 崩溃恢复日志 ==========
+def _text_end(line, column, text):
+    """从 (line, column) 处插入 text 后，text 末尾的 (行, 列)"""
+    newlines = text.count("\n")
+    if not newlines:
+        return line, column + len(text)
+    return line + newlines, len(text) - text.rfind("\n") - 1
+
+
+def _process_alive(pid):
+    """判断进程是否仍在运行（用于跳过其他正在运行的编辑器的恢复日志）"""
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        import ctypes  # Windows 上 os.kill(pid, 0) 会终止进程，改用 OpenProcess 查询
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if handle:
+            ctypes.windll.kernel32.CloseHandle(handle)
+        return bool(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class UndoLog:
+    """编辑器自管理的撤销/重做日志：只保存每次修改插入/删除的内容，不保存整篇快照
+
+    每个撤销步骤是一组修改 [[类型, 行, 列, 文本], ...]，类型 "i" 为插入、"d" 为删除，位置为修改前的坐标。
+    同一次事件处理中的修改（如粘贴时先删除选中内容再插入）合为一步；连续输入或连续删除的单个字符
+    在 MERGE_SECONDS 内合并为一步。总大小超过 budget 时丢弃最旧的步骤（至少保留最近一步）。
+    """
+
+    MERGE_SECONDS = 1.0
+    OP_OVERHEAD = 100                  # 每条记录的列表/整数等额外开销（估算，字节）
+    DEFAULT_BUDGET = 16 * 1024 * 1024  # 每个标签页的默认内存上限
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.undo_stack = collections.deque()
+        self.redo_stack = []
+        self.size = 0       # 估算的总内存占用（字节）
+        self.open = False   # 最近一步是否仍在接收本次事件处理中的修改
+        self._last_time = 0.0
+
+    def _op_size(self, op):
+        return sys.getsizeof(op[3]) + self.OP_OVERHEAD
+
+    def _group_size(self, group):
+        return sum(map(self._op_size, group))
+
+    def record(self, changes, now):
+        """记录一次修改；返回是否新开了一个撤销步骤（调用者应在本次事件处理结束后调用 close_group）"""
+        self.size -= sum(map(self._group_size, self.redo_stack))
+        self.redo_stack = []
+        merged = (len(changes) == 1 and not self.open and now - self._last_time < self.MERGE_SECONDS
+                  and self._merge(changes[0]))
+        self._last_time = now
+        if merged:
+            return False
+        opened = not self.open
+        if opened:
+            self.undo_stack.append([])
+            self.open = True
+        group = self.undo_stack[-1]
+        for kind, line, column, text in changes:
+            op = [kind, line, column, text]
+            group.append(op)
+            self.size += self._op_size(op)
+        while self.size > self.budget and len(self.undo_stack) > 1:
+            self.size -= self._group_size(self.undo_stack.popleft())
+        return opened
+
+    def _merge(self, change):
+        """把单个字符的输入/删除并入上一步（上一步也只有一次同类的单行修改）"""
+        kind, line, column, text = change
+        if not self.undo_stack or len(text) != 1 or text == "\n":
+            return False
+        group = self.undo_stack[-1]
+        if len(group) != 1 or group[0][0] != kind or "\n" in group[0][3]:
+            return False
+        op = group[0]
+        before = self._op_size(op)
+        if kind == "i" and (line, column) == (op[1], op[2] + len(op[3])):
+            op[3] += text
+        elif kind == "d" and (line, column) == (op[1], op[2] - 1):  # 退格
+            op[2], op[3] = column, text + op[3]
+        elif kind == "d" and (line, column) == (op[1], op[2]):      # Delete 键
+            op[3] += text
+        else:
+            return False
+        self.size += self._op_size(op) - before
+        return True
+
+    def close_group(self):
+        self.open = False
+
+    def undo(self):
+        """取出最近一步（调用者按逆序撤销其中的修改）；没有可撤销的步骤时返回 None"""
+        self.open = False
+        self._last_time = 0.0
+        if not self.undo_stack:
+            return None
+        group = self.undo_stack.pop()
+        self.redo_stack.append(group)
+        return group
+
+    def redo(self):
+        self.open = False
+        self._last_time = 0.0
+        if not self.redo_stack:
+            return None
+        group = self.redo_stack.pop()
+        self.undo_stack.append(group)
+        return group
+
+    def reset(self):
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.size = 0
+        self.open = False
+
+
+class EditJournal:
+    """崩溃恢复日志：把自上次保存以来的每次修改追加写入磁盘，写入量只与修改量有关，与文件大小无关
+
+    JSON Lines 格式，第一行为基准 {"path", "size", "mtime_ns"}（以磁盘上的文件为基准；未命名文件以空内容为基准），
+    之后每行一次修改：["i", 行, 列, 文本] / ["d", 行, 列, 结束行, 结束列] / ["s", 全文]。
+    保存后重置，正常关闭时删除；异常退出后残留的日志在下次启动时用于恢复。
+    """
+
+    DIRECTORY = os.path.join(os.path.expanduser("~"), ".hcode", "journal")
+    _ids = itertools.count(1)
+
+    def __init__(self, path=None):
+        self.file_path = os.path.join(self.DIRECTORY, f"{os.getpid()}-{next(self._ids)}.jsonl")
+        self.pending = []
+        self._file = None
+        self.reset(path)
+
+    def reset(self, path=None):
+        """以磁盘上的文件当前状态为基准重新记录（打开/保存后调用）"""
+        self.discard()
+        self.header = {"path": path, "size": None, "mtime_ns": None}
+        if path:
+            try:
+                stat = os.stat(path)
+                self.header.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            except OSError:
+                pass
+
+    def record(self, changes):
+        for kind, line, column, text in changes:
+            if kind == "d":
+                self.pending.append(["d", line, column, *_text_end(line, column, text)])
+            elif kind == "i":
+                self.pending.append(["i", line, column, text])
+            else:
+                self.pending.append(["s", text])
+
+    def flush(self):
+        """把积累的修改追加写入日志文件"""
+        if not self.pending:
+            return
+        if self._file is None:
+            os.makedirs(self.DIRECTORY, exist_ok=True)
+            self._file = open(self.file_path, "w", encoding="utf-8")
+            self._file.write(json.dumps(self.header, ensure_ascii=False) + "\n")
+        pending, self.pending = self.pending, []
+        self._file.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in pending))
+        self._file.flush()
+
+    def discard(self):
+        """删除日志（已保存或放弃修改）"""
+        self.pending = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self.file_path)
+            except OSError:
+                pass
+
+    @classmethod
+    def orphans(cls):
+        """异常退出后残留的日志：[(日志文件, 基准信息, 修改列表)]；跳过仍在运行的编辑器进程的日志"""
+        try:
+            names = sorted(os.listdir(cls.DIRECTORY))
+        except OSError:
+            return []
+        result = []
+        for name in names:
+            pid = name.split("-", 1)[0]
+            if not name.endswith(".jsonl") or not pid.isdigit() or _process_alive(int(pid)):
+                continue
+            path = os.path.join(cls.DIRECTORY, name)
+            header, ops = None, []
+            try:
+                with open(path, encoding="utf-8") as f:
+                    header = json.loads(f.readline())
+                    for line in f:
+                        try:
+                            ops.append(json.loads(line))
+                        except ValueError:
+                            break  # 崩溃时只写了一半的最后一行
+            except (OSError, ValueError):
+                pass
+            result.append((path, header, ops))
+        return result
+
+
+class EditorBuffer:
+    """一个标签页对应的缓冲区：文件路径、修改标记、编辑组件（首次显示时才创建）及回收后的快照
+
+    组件存在时内容以组件为准（高亮token缓存随组件保留）；组件被回收后内容压缩保存在内存中，
+    压缩后仍较大时转存到临时文件。撤销日志与恢复日志属于缓冲区本身，回收组件后仍然保留。
+    """
+
+    SNAPSHOT_DISK_BYTES = 4 * 1024 * 1024  # 压缩后超过该大小的快照转存磁盘
+
+    def __init__(self, path=None, content="", large=False):
+        self.path = path
+        self.is_modified = False
+        self.edit_count = 0          # 编辑次数，用于判断后台保存期间是否有新修改
+        self.version = 0             # 内容版本（含程序化修改），用于判断缓存是否失效
+        self.search_cache = None     # 查找用的 (版本, 全文, LineIndex)
+        self.large = large           # 大文件模式（只高亮可见区域）
+        self.loading = False         # 正在后台载入（期间不回收组件）
+        self.load_token = None       # 大文件后台载入任务的标识（关闭标签页时作废）
+        self.last_active = time.monotonic()
+        self.view = ("1.0", 0.0)     # 回收时保存的 (光标位置, 滚动位置)
+        self.undo_log = UndoLog()    # 撤销/重做（只保存修改的内容，有内存上限）
+        self.journal = EditJournal(path)  # 崩溃恢复日志
+        self.diagnostics = {}        # 语法检查结果：行号 -> (级别, 信息)
+        self.check_job = None        # 等待中的语法检查（after 任务）
+        self.check_future = None     # 进行中的语法检查
+        self.check_generation = 0    # 每次修改加一，旧的检查结果不再显示
+        self.disk_signature = None   # 上次载入/保存时磁盘文件的 stat 签名（检测外部修改）
+        self.disk_digest = None      # 上次载入/保存时磁盘文件的内容哈希（后台计算，未算完时为 None）
+        self.disk_conflict = False   # 外部修改后选择了保留编辑器中的内容（保存时需确认覆盖）
+        self.watch_pending = False   # 正在读取/处理磁盘上变化后的内容
+        self.saving = False          # 正在后台保存（期间磁盘文件的变化来自自身）
+        # 以下在组件创建后才有值
+        self.widget = None
+        self.proxy = None
+        self.highlighter = None
+        self.scheduler = None
+        self._text = content         # 组件尚未创建时的原始内容
+        self._snapshot = None        # 回收后的压缩内容
+        self._snapshot_path = None   # 回收后转存到磁盘的快照文件
+
+    @property
+    def name(self):
+        return os.path.basename(self.path) if self.path else "未命名文件"
+
+    def store_snapshot(self, text):
+        """保存回收时的内容快照（zlib压缩，过大时写入临时文件）"""
+        data = zlib.compress(text.encode("utf-8"), 1)
+        if len(data) > self.SNAPSHOT_DISK_BYTES:
+            fd, self._snapshot_path = tempfile.mkstemp(prefix="hcode_buf_", suffix=".z")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        else:
+            self._snapshot = data
+
+    def take_content(self):
+        """取出创建组件所需的内容，并释放快照"""
+        if self._snapshot_path:
+            with open(self._snapshot_path, "rb") as f:
+                data = f.read()
+            self.discard_snapshot()
+            return zlib.decompress(data).decode("utf-8")
+        if self._snapshot is not None:
+            data, self._snapshot = self._snapshot, None
+            return zlib.decompress(data).decode("utf-8")
+        text, self._text = self._text, ""
+        return text
+
+    def discard_snapshot(self):
+        self._snapshot = None
+        if self._snapshot_path:
+            try:
+                os.remove(self._snapshot_path)
+            except OSError:
+                pass
+            self._snapshot_path = None
+
+
+def _atomic_write(path, text, chunk_size=1 << 20):
+    """原子写入：先分块写入同目录下的临时文件并落盘，再用 os.replace 替换目标文件"""
+    path = os.path.realpath(path)  # 符号链接：写入链接指向的文件，而不是把链接替换成普通文件
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=".hcode_", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for start in range(0, len(text), chunk_size):
+                f.write(text[start:start + chunk_size])
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)  # 保留原文件权限
+        else:
+            # mkstemp 创建的文件权限为 0600；新文件改为与 open() 新建时相同的 0666 & ~umask
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# ========== 外部修改检测：stat 签名 + 内容哈希，变化后按行差异更新 ==========
+def _file_signature(path):
+    """文件的 stat 签名 (mtime_ns, 大小, inode)，检查一次只需一次 stat；文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _read_disk(path, decode=True, chunk_size=1 << 20):
+    """读取磁盘上的文件：返回 (stat签名, 内容哈希, 文本)；decode 为假时只计算哈希，文本为 None
+
+    文本按通用换行符规范化，与 open() 文本模式读到的内容一致。
+    """
+    import hashlib  # 延迟导入
+    digest = hashlib.sha1()
+    chunks = [] if decode else None
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            digest.update(data)
+            if decode:
+                chunks.append(data)
+    text = None
+    if decode:
+        text = b"".join(chunks).decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino), digest.hexdigest(), text
+
+
+def _diff_lines(old, new):
+    """逐行比较两段文本，返回需要修改的行区间 [(i1, i2, 新文本)]
+
+    旧文本第 i1..i2 行（从0开始，左闭右开）换成新文本（多行以换行符连接；纯删除时为 None）。
+    先跳过相同的首尾行，只对中间部分用 difflib 比较，重新生成的大文件通常只有局部变化。
+    """
+    import difflib  # 延迟导入
+    a, b = old.split("\n"), new.split("\n")
+    limit = min(len(a), len(b))
+    head = 0
+    while head < limit and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+    matcher = difflib.SequenceMatcher(None, a[head:len(a) - tail], b[head:len(b) - tail])
+    return [(i1 + head, i2 + head, "\n".join(b[j1 + head:j2 + head]) if j2 > j1 else None)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+class HCodeEditorWithRun:
+    def __init__(self, root, recover=True, startup_timer=None, paths=()):
         self.root = root
         self.root.title("Hcode - 未命名文件 [Python编辑器]")
         self.root.geometry("1200x800")  # 适配宽屏，操作更舒适
         self.root.configure(bg=COLOR_BG_MAIN)
         self.root.resizable(True, True)
 
-        # 核心状态变量
-        self.current_file = None  # 当前文件路径
-        self.is_modified = False  # 文件是否未保存
+        # 核心状态变量（文件路径/修改标记等按标签页保存在 EditorBuffer 中）
+        self.buffers = []           # 所有标签页
+        self.buffer = None          # 当前标签页
+        self._tabs = {}             # 标签页 -> 标签栏上的组件
+        self.runner = CodeRunner()  # 用户代码在独立子进程中运行
+        self.checker = SyntaxChecker()  # 后台语法检查（结果按内容哈希缓存）
+        self._check_pool = None     # 大文件语法检查用的子进程池（按需创建）
+        self.kernel = KernelRunner()  # 持久内核（按需启动）
+        self._kernel_jobs = []      # 待在内核中执行的代码：(标签页, 单元格序号, 起始行, 代码, 文件名, 全文, 工作目录)
+        self._kernel_cells = {}     # 标签页 -> {单元格序号: 最近一次成功执行的代码}
+        self._loading_file = False  # 程序化载入内容时不标记为未保存
+        self._replaying = False     # 正在执行撤销/重做（不再记入撤销日志）
+        self._journal_job = None    # 等待写盘的恢复日志（after 任务）
+        self._journal_error = False # 恢复日志写入失败（只提示一次）
+        self._executor = None       # 后台任务线程池（保存/目录扫描/跨文件搜索等，首次使用时创建）
+        self.startup_timer = startup_timer  # --startup-profile 的启动计时
+        self._ui_ready = False      # 首帧之后创建的部分是否已就绪
+        self.file_search_index = FileSearchIndex()  # 跨文件搜索的行偏移索引缓存
+        self._search_token = None   # 当前“在文件中查找”任务的标识
+        self._find_refresh_job = None  # 修改后等待执行的全部匹配刷新（after 任务）
+        self._profile = None        # 最近一次性能分析运行：统计文件路径/运行的文件名与标签页/热点表数据
+        self.workspace = None       # 当前打开的文件夹（WorkspaceScanner）
+        self._loaded_dirs = set()   # 工作区树中已载入子项的目录
+        self._workspace_watch = None  # 进行中的工作区增量刷新（外部修改检测）
+        self._initial_paths = list(paths)  # 命令行指定的文件/文件夹（首帧显示后再打开）
+        self._recover = recover     # 首帧显示后是否检查崩溃恢复日志
+        self._first_paint_job = None  # 等待首帧的超时任务
+        self._deferred_started = False  # 延迟初始化已开始（Expose 与超时任务只执行先到的一个）
 
-        # 初始化界面、事件、控制台、语法高亮
+        # 先构建首帧需要的界面并创建第一个标签页；侧边栏、控制台、高亮标签等在首帧显示后再创建
         self._init_ui()
-        self._init_highlight_tags()  # 新增：初始化语法高亮标签
         self._bind_events()
-        self._update_line_numbers()
+        self._create_buffer()
+        if self.root.state() == "withdrawn":  # 不显示窗口（如基准测试）：没有首帧可等，空闲时直接初始化
+            self.root.after_idle(self._init_deferred)
+        else:
+            # 等到窗口第一次 Expose（映射后开始重绘）再初始化其余部分；窗口迟迟不显示时超时后照常初始化
+            self.root.bind("<Expose>", self._on_first_expose)
+            self._first_paint_job = self.root.after(self.FIRST_PAINT_TIMEOUT_MS, self._init_deferred)
+        self.root.after(self.BUFFER_CHECK_MS, self._evict_idle_buffers)
+        if startup_timer is not None:
+            startup_timer.mark("界面构建")
+
+    def _on_first_expose(self, event=None):
+        """窗口首次 Expose：重绘由 Expose 排入空闲队列，排在其后的空闲任务执行时首帧已绘制"""
+        self.root.unbind("<Expose>")
+        self.root.after_idle(self._init_deferred)
+
+    def _init_deferred(self):
+        """首帧显示后再创建的部分：侧边栏、控制台（含输出重定向）、已创建编辑框的高亮标签"""
+        if self._deferred_started:
+            return
+        self._deferred_started = True
+        if self._first_paint_job is not None:
+            self.root.after_cancel(self._first_paint_job)
+            self._first_paint_job = None
+        self.root.unbind("<Expose>")
+        self.root.update_idletasks()  # 先完成尚未执行的重绘
+        if self.startup_timer is not None:
+            self.startup_timer.mark("首帧绘制")
+        self._init_sidebar()
         self._init_console()
+        for buffer in self.buffers:
+            if buffer.widget is not None:
+                self._init_highlight_tags(buffer.widget)
+        self._ui_ready = True
+        self._refresh_buffer_views()
+        if self._initial_paths:
+            self.root.after_idle(self._open_paths, self._initial_paths)  # 侧边栏与控制台先显示出来
+            self._initial_paths = []
+        self.root.after(self.WATCH_MS, self._watch_files)
+        if self._recover:
+            self.root.after_idle(self._recover_journals)  # 界面显示后再询问是否恢复上次异常退出时的修改
+        if self.startup_timer is not None:
+            self.startup_timer.mark("延迟初始化")
+            self.startup_timer.report()
+
+    @property
+    def executor(self):
+        """后台任务线程池（首次使用时创建，启动时不导入 concurrent.futures）"""
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=4)
+        return self._executor
+
+    FIRST_PAINT_TIMEOUT_MS = 1000  # 等待首帧的最长时间
 
     def _init_ui(self):
-        """初始化所有界面：菜单栏+侧边栏+编辑区+控制台+状态栏+运行按钮"""
+        """初始化首帧需要的界面：菜单栏+运行按钮+标签栏+编辑区+状态栏，侧边栏与控制台只创建占位框架"""
         # ========== 1. 顶部菜单栏 ==========
         menu_bar = tk.Menu(self.root, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, tearoff=0)
         # 文件菜单
         file_menu = tk.Menu(menu_bar, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, tearoff=0)
         file_menu.add_command(label="新建", command=self.new_file, accelerator="Ctrl+N")
         file_menu.add_command(label="打开", command=self.open_file, accelerator="Ctrl+O")
+        file_menu.add_command(label="打开文件夹", command=self.open_folder, accelerator="Ctrl+Shift+O")
+        file_menu.add_command(label="刷新工作区", command=self.refresh_workspace)
         file_menu.add_separator()
         file_menu.add_command(label="保存", command=self.save_file, accelerator="Ctrl+S")
         file_menu.add_command(label="另存为", command=self.save_as_file, accelerator="Ctrl+Shift+S")
+        file_menu.add_separator()
+        file_menu.add_command(label="关闭标签页", command=self.close_buffer, accelerator="Ctrl+W")
         menu_bar.add_cascade(label="文件", menu=file_menu)
         # 编辑菜单
         edit_menu = tk.Menu(menu_bar, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, tearoff=0)
-        edit_menu.add_command(label="撤销", command=lambda: self.editor.edit_undo(), accelerator="Ctrl+Z")
-        edit_menu.add_command(label="重做", command=lambda: self.editor.edit_redo(), accelerator="Ctrl+Y")
+        edit_menu.add_command(label="撤销", command=self.undo, accelerator="Ctrl+Z")
+        edit_menu.add_command(label="重做", command=self.redo, accelerator="Ctrl+Y")
         edit_menu.add_command(label="全选", command=lambda: self.editor.event_generate("<<SelectAll>>"), accelerator="Ctrl+A")
+        edit_menu.add_separator()
+        edit_menu.add_command(label="查找", command=self.show_find, accelerator="Ctrl+F")
+        edit_menu.add_command(label="替换", command=lambda: self.show_find(replace=True), accelerator="Ctrl+H")
+        edit_menu.add_command(label="在文件中查找", command=self.find_in_files, accelerator="Ctrl+Shift+F")
         menu_bar.add_cascade(label="编辑", menu=edit_menu)
         # 运行菜单
         run_menu = tk.Menu(menu_bar, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, tearoff=0)
         run_menu.add_command(label="运行代码", command=self.run_code, accelerator="F5")
+        run_menu.add_command(label="性能分析运行", command=self.profile_code, accelerator="Ctrl+F5")
+        run_menu.add_command(label="停止运行", command=self.stop_code, accelerator="Shift+F5")
         run_menu.add_command(label="清空控制台", command=self.clear_console, accelerator="Ctrl+L")
+        run_menu.add_command(label="保存完整输出...", command=self.save_console_output)
+        self.console_spill_var = tk.BooleanVar(value=True)
+        run_menu.add_checkbutton(label="超出行数上限时保留完整输出到磁盘", variable=self.console_spill_var,
+                                 command=lambda: setattr(self.console_sink, "spill_to_disk", self.console_spill_var.get()))
+        run_menu.add_separator()
+        self.kernel_mode_var = tk.BooleanVar(value=False)
+        run_menu.add_checkbutton(label="持久内核模式（保留导入与变量，F5只运行修改过的单元格）", variable=self.kernel_mode_var)
+        run_menu.add_command(label="运行当前单元格（# %%）", command=self.run_current_cell, accelerator="Ctrl+Enter")
+        run_menu.add_command(label="运行选中代码", command=self.run_selection, accelerator="F9")
+        run_menu.add_command(label="重启内核", command=self.restart_kernel)
+        run_menu.add_separator()
+        self.trace_memory_var = tk.BooleanVar(value=False)
+        run_menu.add_checkbutton(label="性能分析时跟踪内存分配（tracemalloc）", variable=self.trace_memory_var)
+        run_menu.add_command(label="导出性能分析结果...", command=self.export_profile)
         menu_bar.add_cascade(label="运行", menu=run_menu)
         self.root.config(menu=menu_bar)
 
@@ -76,10 +1636,8 @@ class HCodeEditorWithRun:
         sidebar = tk.Frame(main_frame, bg=COLOR_BG_SIDEBAR, width=180)
         sidebar.pack(side=tk.LEFT, fill=tk.Y)
         sidebar.pack_propagate(False)
-        tk.Label(sidebar, text="资源管理器", bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_WHITE, font=("Arial",10)).pack(pady=10, padx=15, anchor=tk.W)
-        self.file_list = tk.Listbox(sidebar, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, bd=0, highlightthickness=0,
-                                    selectbackground=COLOR_SELECT, selectforeground=COLOR_FG_WHITE)
-        self.file_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.sidebar = sidebar  # 内容在首帧显示后创建（见 _init_sidebar）
+        self.file_list = None
 
         # ---------- 右侧主区（编辑区 + 控制台区，垂直排列） ----------
         right_frame = tk.Frame(main_frame, bg=COLOR_BG_MAIN)
@@ -92,125 +1650,213 @@ class HCodeEditorWithRun:
         self.run_btn = tk.Button(btn_frame, text="运行代码 (F5)", command=self.run_code, bg=COLOR_BTN,
                                  fg=COLOR_FG_WHITE, bd=0, padx=15, pady=2, font=("Arial",9,"bold"))
         self.run_btn.pack(side=tk.LEFT, padx=5)
+        # 停止运行按钮（仅运行中可用）
+        self.stop_btn = tk.Button(btn_frame, text="停止 (Shift+F5)", command=self.stop_code, bg=COLOR_BG_SIDEBAR,
+                                  fg=COLOR_FG_TEXT, bd=0, padx=15, pady=2, font=("Arial",9), state=tk.DISABLED)
+        self.stop_btn.pack(side=tk.LEFT, padx=5)
         # 清空控制台按钮
         self.clear_console_btn = tk.Button(btn_frame, text="清空控制台 (Ctrl+L)", command=self.clear_console,
                                            bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, bd=0, padx=15, pady=2, font=("Arial",9))
         self.clear_console_btn.pack(side=tk.LEFT, padx=5)
 
-        # 编辑区（行号 + 编辑框 + 滚动条）
-        edit_container = tk.Frame(right_frame, bg=COLOR_BG_EDITOR)
-        edit_container.pack(fill=tk.BOTH, expand=True, pady=(0,3))
+        # 标签栏（每个打开的文件一个标签页）
+        self.tab_bar = tk.Frame(right_frame, bg=COLOR_BG_SIDEBAR)
+        self.tab_bar.pack(fill=tk.X, padx=5)
+
+        # 查找/替换栏（首次按 Ctrl+F / Ctrl+H 时才创建，显示在编辑区上方）
+        self.right_frame = right_frame
+        self.find_bar = None
+
+        # 编辑区（行号 + 编辑框 + 滚动条；编辑框按标签页创建，见 _ensure_widget）
+        self.edit_container = tk.Frame(right_frame, bg=COLOR_BG_EDITOR)
+        self.edit_container.pack(fill=tk.BOTH, expand=True, pady=(0,3))
         # 编辑区滚动条
-        self.edit_scroll = tk.Scrollbar(edit_container, bg=COLOR_BG_SIDEBAR, troughcolor=COLOR_BG_MAIN, bd=0)
+        self.edit_scroll = tk.Scrollbar(self.edit_container, bg=COLOR_BG_SIDEBAR, troughcolor=COLOR_BG_MAIN, bd=0)
         self.edit_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        # 行号框（优化：固定字体，与编辑区一致）
-        self.line_numbers = tk.Text(edit_container, width=4, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, bd=0,
-                                    highlightthickness=0, state=tk.DISABLED, wrap=tk.NONE, font=("Consolas",12))
-        self.line_numbers.pack(side=tk.LEFT, fill=tk.Y)
-        # 核心代码编辑框（优化：新增光标色、固定等宽字体）
-        self.editor = tk.Text(edit_container, bg=COLOR_BG_EDITOR, fg=COLOR_FG_TEXT, bd=0, highlightthickness=0,
-                              wrap=tk.NONE, undo=True, maxundo=-1, font=("Consolas",12),
-                              insertbackground=COLOR_CURSOR,  # 新增：白色光标，更醒目
-                              yscrollcommand=self._sync_edit_scroll)
-        self.editor.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        # 行号栏（优化：Canvas只绘制可见行，字体与编辑区一致）
+        self.gutter = LineNumberGutter(self.edit_container, ("Consolas",12))
+        self.gutter.canvas.pack(side=tk.LEFT, fill=tk.Y)
         self.edit_scroll.config(command=self._sync_edit_scroll)
 
         # 控制台输出区（仿VSCode终端，纯黑背景+绿色文字）
         console_frame = tk.Frame(right_frame, bg=COLOR_BG_CONSOLE, height=200)
         console_frame.pack(fill=tk.BOTH, expand=False)
         console_frame.pack_propagate(False)  # 固定高度
-        # 控制台标题
-        tk.Label(console_frame, text="▶ 控制台输出（运行结果/错误信息）", bg=COLOR_BG_SIDEBAR,
-                 fg=COLOR_FG_WHITE, anchor=tk.W, font=("Arial",9)).pack(fill=tk.X)
-        # 控制台滚动条
-        self.console_scroll = tk.Scrollbar(console_frame, bg=COLOR_BG_SIDEBAR, troughcolor=COLOR_BG_CONSOLE, bd=0)
-        self.console_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        # 控制台文本框（只读，绿色文字，优化：提前配置错误标签）
-        self.console = tk.Text(console_frame, bg=COLOR_BG_CONSOLE, fg=COLOR_FG_CONSOLE, bd=0, highlightthickness=0,
-                               wrap=tk.WORD, state=tk.DISABLED, font=("Consolas",11),
-                               yscrollcommand=self.console_scroll.set)
-        self.console.tag_configure("error", foreground=COLOR_FG_ERROR)  # 提前配置错误标签，避免重复创建
-        self.console.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.console_scroll.config(command=self.console.yview)
+        self.console_frame = console_frame  # 内容在首帧显示后创建（见 _init_console）
+        self.console = None
 
         # ========== 3. 底部状态栏 ==========
         self.status_bar = tk.Label(self.root, text="未命名文件 | 已保存 | 按F5运行代码 | Ctrl+L清空控制台",
                                    bg=COLOR_BG_STATUS, fg=COLOR_FG_WHITE, anchor=tk.W, padx=10, font=("Arial",9))
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
 
-    def _init_highlight_tags(self):
+    def _init_find_bar(self, parent):
+        """创建查找/替换栏（默认隐藏）"""
+        self.find_var = tk.StringVar()
+        self.replace_var = tk.StringVar()
+        self.find_regex_var = tk.BooleanVar(value=False)
+        self.find_case_var = tk.BooleanVar(value=False)
+        self.find_bar = tk.Frame(parent, bg=COLOR_BG_SIDEBAR)
+        entry_opts = dict(bg=COLOR_BG_MAIN, fg=COLOR_FG_TEXT, insertbackground=COLOR_CURSOR, bd=0, width=30)
+        btn_opts = dict(bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, bd=0, padx=8, font=("Arial",9))
+        check_opts = dict(bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, selectcolor=COLOR_BG_MAIN,
+                          activebackground=COLOR_BG_SIDEBAR, font=("Arial",9),
+                          command=self._refresh_find_highlight)
+        find_row = tk.Frame(self.find_bar, bg=COLOR_BG_SIDEBAR)
+        find_row.pack(fill=tk.X)
+        tk.Label(find_row, text="查找", bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, font=("Arial",9), width=4).pack(side=tk.LEFT)
+        self.find_entry = tk.Entry(find_row, textvariable=self.find_var, **entry_opts)
+        self.find_entry.pack(side=tk.LEFT, padx=5, pady=2)
+        self.find_entry.bind("<Return>", lambda e: self.find_next())
+        self.find_entry.bind("<Shift-Return>", lambda e: self.find_next(backward=True))
+        self.find_entry.bind("<Escape>", lambda e: self.hide_find())
+        self.find_var.trace_add("write", lambda *args: self._refresh_find_highlight())
+        tk.Checkbutton(find_row, text="正则", variable=self.find_regex_var, **check_opts).pack(side=tk.LEFT)
+        tk.Checkbutton(find_row, text="区分大小写", variable=self.find_case_var, **check_opts).pack(side=tk.LEFT)
+        tk.Button(find_row, text="上一个", command=lambda: self.find_next(backward=True), **btn_opts).pack(side=tk.LEFT, padx=2)
+        tk.Button(find_row, text="下一个", command=self.find_next, **btn_opts).pack(side=tk.LEFT, padx=2)
+        tk.Button(find_row, text="在文件中查找", command=self.find_in_files, **btn_opts).pack(side=tk.LEFT, padx=2)
+        tk.Button(find_row, text="×", command=self.hide_find, **btn_opts).pack(side=tk.RIGHT)
+        self.find_status = tk.Label(find_row, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, font=("Arial",9))
+        self.find_status.pack(side=tk.LEFT, padx=5)
+        self.replace_row = tk.Frame(self.find_bar, bg=COLOR_BG_SIDEBAR)
+        tk.Label(self.replace_row, text="替换", bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, font=("Arial",9), width=4).pack(side=tk.LEFT)
+        replace_entry = tk.Entry(self.replace_row, textvariable=self.replace_var, **entry_opts)
+        replace_entry.pack(side=tk.LEFT, padx=5, pady=2)
+        replace_entry.bind("<Escape>", lambda e: self.hide_find())
+        tk.Button(self.replace_row, text="替换", command=self.replace_one, **btn_opts).pack(side=tk.LEFT, padx=2)
+        tk.Button(self.replace_row, text="全部替换", command=self.replace_all, **btn_opts).pack(side=tk.LEFT, padx=2)
+
+    def _init_highlight_tags(self, widget):
         """新增：初始化Python语法高亮标签（VSCode原版配色）"""
-        self.editor.tag_configure("keyword", foreground=COLOR_FG_KEYWORD, font=("Consolas",12,"bold"))
-        self.editor.tag_configure("string", foreground=COLOR_FG_STRING)
-        self.editor.tag_configure("comment", foreground=COLOR_FG_COMMENT, font=("Consolas",12,"italic"))
-        self.editor.tag_configure("number", foreground=COLOR_FG_NUMBER)
+        widget.tag_configure("keyword", foreground=COLOR_FG_KEYWORD, font=("Consolas",12,"bold"))
+        widget.tag_configure("string", foreground=COLOR_FG_STRING)
+        widget.tag_configure("comment", foreground=COLOR_FG_COMMENT, font=("Consolas",12,"italic"))
+        widget.tag_configure("number", foreground=COLOR_FG_NUMBER)
+        widget.tag_configure("builtin", foreground=COLOR_FG_BUILTIN)
+        widget.tag_configure("decorator", foreground=COLOR_FG_DECORATOR)
+        # 查找匹配高亮
+        widget.tag_configure("find_match", background=COLOR_FIND_MATCH)
+        widget.tag_configure("find_current", background=COLOR_FIND_CURRENT)
         # 保证选中内容优先级高于高亮标签，避免选中时被高亮覆盖
-        self.editor.tag_raise("sel")
+        widget.tag_raise("sel")
+        # 语法检查结果：错误红色波浪线的近似（带颜色的下划线）
+        for tag, color in (("lint_error", COLOR_FG_ERROR), ("lint_warning", COLOR_FG_WARNING)):
+            try:
+                widget.tag_configure(tag, underline=True, underlinefg=color)
+            except tk.TclError:  # Tk 8.6.6 之前不支持 underlinefg
+                widget.tag_configure(tag, underline=True)
 
     def _bind_events(self):
         """绑定所有快捷键和事件（新增：自动缩进、语法高亮触发）"""
-        # 编辑区事件：修改标记+更新行号+语法高亮（新增）
-        self.editor.bind("<KeyRelease>", lambda e: (self._mark_modified(), self._update_line_numbers(), self._syntax_highlight()))
-        self.editor.bind("<MouseWheel>", lambda e: self._update_line_numbers())
-        self.editor.bind("<ButtonRelease-1>", lambda e: self._update_line_numbers())
-        # 新增：回车自动缩进（核心功能）
-        self.editor.bind("<Return>", self._auto_indent)
+        # 编辑区修改（修改标记/行号/语法高亮）由各标签页的 EditScheduler 订阅<<Modified>>统一调度
+        # 滚动（含鼠标滚轮）经由 yscrollcommand 同步行号；编辑框自身的事件在 _ensure_widget 中绑定
         # 文件操作快捷键
         self.root.bind("<Control-n>", lambda e: self.new_file())
         self.root.bind("<Control-o>", lambda e: self.open_file())
+        self.root.bind("<Control-O>", lambda e: self.open_folder())
         self.root.bind("<Control-s>", lambda e: self.save_file())
         self.root.bind("<Control-S>", lambda e: self.save_as_file())
+        # 查找快捷键
+        self.root.bind("<Control-f>", lambda e: self.show_find())
+        self.root.bind("<Control-F>", lambda e: self.find_in_files())
+        # 标签页快捷键
+        self.root.bind("<Control-w>", lambda e: self.close_buffer())
+        self.root.bind("<Control-Next>", lambda e: self._cycle_buffer(1))
+        self.root.bind("<Control-Prior>", lambda e: self._cycle_buffer(-1))
         # 编辑快捷键
-        self.root.bind("<Control-z>", lambda e: self.editor.edit_undo())
-        self.root.bind("<Control-y>", lambda e: self.editor.edit_redo())
+        self.root.bind("<Control-z>", lambda e: self.undo())
+        self.root.bind("<Control-y>", lambda e: self.redo())
         self.root.bind("<Control-a>", lambda e: self.editor.event_generate("<<SelectAll>>"))
         # 运行/控制台快捷键
         self.root.bind("<F5>", lambda e: self.run_code())
+        self.root.bind("<Shift-F5>", lambda e: self.stop_code())
+        self.root.bind("<Control-F5>", lambda e: self.profile_code())
+        self.root.bind("<F9>", lambda e: self.run_selection())
         self.root.bind("<Control-l>", lambda e: self.clear_console())
         # 关闭窗口检查
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
-    def _init_console(self):
-        """初始化控制台：修复重定向逻辑，避免冗余buffer"""
-        # 直接重定向，无需额外StringIO缓冲，减少冗余
-        sys.stdout = self
-        sys.stderr = self
+    def _init_sidebar(self):
+        """创建侧边栏内容：打开的文件列表 + 工作区目录树"""
+        sidebar = self.sidebar
+        tk.Label(sidebar, text="资源管理器", bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_WHITE, font=("Arial",10)).pack(pady=10, padx=15, anchor=tk.W)
+        self.file_list = tk.Listbox(sidebar, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, bd=0, highlightthickness=0,
+                                    selectbackground=COLOR_SELECT, selectforeground=COLOR_FG_WHITE)
+        self.file_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.file_list.bind("<<ListboxSelect>>", self._on_file_list_select)
+        # 工作区目录树（打开文件夹后显示，子目录在展开时才扫描）
+        style = ttk.Style(self.root)
+        style.configure("Hcode.Treeview", background=COLOR_BG_SIDEBAR, fieldbackground=COLOR_BG_SIDEBAR,
+                        foreground=COLOR_FG_TEXT, borderwidth=0)
+        style.map("Hcode.Treeview", background=[("selected", COLOR_SELECT)], foreground=[("selected", COLOR_FG_WHITE)])
+        self.workspace_tree = ttk.Treeview(sidebar, show="tree", style="Hcode.Treeview", selectmode="browse")
+        self.workspace_tree.bind("<<TreeviewOpen>>", self._on_tree_open)
+        self.workspace_tree.bind("<Double-1>", self._on_tree_activate)
 
-    def write(self, text):
-        """重定向write方法：优化性能，避免重复配置标签"""
-        self.console.config(state=tk.NORMAL)
-        # 错误信息标红（优化：更全面的错误关键词匹配）
-        error_keywords = ["Error", "Traceback", "SyntaxError", "NameError", "TypeError", "IndexError", "KeyError"]
-        if any(keyword in text for keyword in error_keywords):
-            self.console.insert(tk.END, text, "error")
-        else:
-            self.console.insert(tk.END, text)
-        self.console.config(state=tk.DISABLED)
-        self.console.yview(tk.END)  # 自动滚动到最后一行
-
-    def flush(self):
-        """重定向flush方法：兼容标准输出协议"""
-        pass
+    def _init_console(self):
+        """初始化控制台：输出先缓冲再批量刷新，stderr按流标红（优化：不再逐次匹配错误关键词）"""
+        # 控制台标题
+        tk.Label(self.console_frame, text="▶ 控制台输出（运行结果/错误信息）", bg=COLOR_BG_SIDEBAR,
+                 fg=COLOR_FG_WHITE, anchor=tk.W, font=("Arial",9)).pack(fill=tk.X)
+        # 控制台滚动条
+        self.console_scroll = tk.Scrollbar(self.console_frame, bg=COLOR_BG_SIDEBAR, troughcolor=COLOR_BG_CONSOLE, bd=0)
+        self.console_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        # 控制台文本框（只读，绿色文字，优化：提前配置错误标签）
+        self.console = tk.Text(self.console_frame, bg=COLOR_BG_CONSOLE, fg=COLOR_FG_CONSOLE, bd=0, highlightthickness=0,
+                               wrap=tk.WORD, state=tk.DISABLED, font=("Consolas",11),
+                               yscrollcommand=self.console_scroll.set)
+        self.console.tag_configure("error", foreground=COLOR_FG_ERROR)  # 提前配置错误标签，避免重复创建
+        # 可点击的 文件:行:列 链接（在文件中查找的结果）
+        self.console.tag_configure("link", foreground=COLOR_FG_LINK, underline=True)
+        self.console.tag_bind("link", "<Button-1>", self._on_console_link)
+        self.console.tag_bind("link", "<Enter>", lambda e: self.console.config(cursor="hand2"))
+        self.console.tag_bind("link", "<Leave>", lambda e: self.console.config(cursor=""))
+        self.console.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.console_scroll.config(command=self.console.yview)
+        # 性能分析热点表（性能分析运行结束后显示在控制台右侧）
+        self.profile_frame = tk.Frame(self.console_frame, bg=COLOR_BG_SIDEBAR, width=520)
+        self.profile_frame.pack_propagate(False)
+        profile_header = tk.Frame(self.profile_frame, bg=COLOR_BG_SIDEBAR)
+        profile_header.pack(fill=tk.X)
+        tk.Label(profile_header, text="📊 性能分析热点", bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_WHITE,
+                 font=("Arial",9)).pack(side=tk.LEFT)
+        tk.Button(profile_header, text="×", command=self.hide_profile, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT,
+                  bd=0, padx=8, font=("Arial",9)).pack(side=tk.RIGHT)
+        tk.Button(profile_header, text="导出...", command=self.export_profile, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT,
+                  bd=0, padx=8, font=("Arial",9)).pack(side=tk.RIGHT)
+        self.profile_table = ttk.Treeview(self.profile_frame, columns=[c[0] for c in self.PROFILE_COLUMNS],
+                                          show="headings", style="Hcode.Treeview", selectmode="browse")
+        for column, heading, width in self.PROFILE_COLUMNS:
+            self.profile_table.heading(column, text=heading, command=lambda c=column: self._sort_profile(c))
+            self.profile_table.column(column, width=width, anchor=tk.W if column in ("function", "location") else tk.E)
+        self.profile_table.pack(fill=tk.BOTH, expand=True)
+        self.profile_table.bind("<<TreeviewSelect>>", self._on_profile_select)
+        # 输出缓冲并重定向标准输出/错误
+        self.console_sink = ConsoleSink(self.console)
+        self.console_sink.spill_to_disk = self.console_spill_var.get()
+        sys.stdout = ConsoleStream(self.console_sink)
+        sys.stderr = ConsoleStream(self.console_sink, "error")
 
     def _sync_edit_scroll(self, *args):
-        """编辑区滚动同步：行号+编辑框+滚动条（优化：更稳定的同步逻辑）"""
-        self.editor.yview(*args)
-        self.line_numbers.yview(*args)
+        """编辑区滚动同步：行号+编辑框+滚动条
+
+        同时作为滚动条的 command（参数为 moveto/scroll）和编辑区的 yscrollcommand（参数为可见比例）。
+        """
+        if args and args[0] in ("moveto", "scroll"):
+            self.editor.yview(*args)  # 拖动滚动条：编辑区滚动后会再次回调本方法
+            return
         self.edit_scroll.set(*args)
+        self._update_line_numbers()
+        self.highlighter.schedule()  # 滚动后优先高亮新进入可见区域的行
+        if self.buffer.large or int(self.editor.index("end-1c").split(".")[0]) > self.FIND_HIGHLIGHT_ALL_LINES:
+            self._refresh_find_highlight()  # 查找高亮只覆盖可见区域，滚动后需要刷新
 
     def _update_line_numbers(self):
-        """更新编辑区行号（优化：容错性更强，避免空内容报错）"""
+        """更新编辑区行号（优化：只绘制可见行，视图未变化时不重绘）"""
         try:
-            content = self.editor.get("1.0", tk.END)
-            line_count = max(content.count("\n"), 1)  # 至少显示1行
-            line_text = "\n".join(str(i) for i in range(1, line_count))
-            self.line_numbers.config(state=tk.NORMAL)
-            self.line_numbers.delete("1.0", tk.END)
-            self.line_numbers.insert("1.0", line_text)
-            self.line_numbers.config(state=tk.DISABLED)
-            # 行号与编辑区滚动位置完全同步
-            self.line_numbers.yview_moveto(self.editor.yview()[0])
-        except Exception:
+            self.gutter.redraw()
+        except tk.TclError:
             pass
 
     def _auto_indent(self, event):
@@ -230,214 +1876,1869 @@ class HCodeEditorWithRun:
         return "break"
 
     def _syntax_highlight(self):
-        """新增：Python实时语法高亮（关键字/字符串/注释/数字）"""
-        # 先清除所有现有高亮标签，避免叠加
-        for tag in ["keyword", "string", "comment", "number"]:
-            self.editor.tag_remove(tag, "1.0", tk.END)
-
-        # 获取编辑区所有内容，按行处理
-        all_content = self.editor.get("1.0", tk.END)
-        lines = all_content.split("\n")
-        current_line = 1
-
-        for line in lines:
-            if not line:
-                current_line += 1
-                continue
+        """Python语法高亮（优化：交给增量引擎，只处理修改过的行，可见区域优先）"""
+        self.highlighter.schedule()
 
-            # 1. 注释高亮（# 开头，行内注释均支持）
-            comment_index = line.find("#")
-            if comment_index != -1:
-                self.editor.tag_add(
-                    "comment",
-                    f"{current_line}.{comment_index}",
-                    f"{current_line}.end"
-                )
-                # 注释后的内容不参与其他高亮，截断处理
-                line = line[:comment_index]
-
-            # 2. 字符串高亮（单引号/双引号，支持单行）
-            for quote in ["'", '"']:
-                start_idx = 0
-                while True:
-                    # 查找字符串开始位置
-                    s_pos = line.find(quote, start_idx)
-                    if s_pos == -1:
-                        break
-                    # 查找字符串结束位置
-                    e_pos = line.find(quote, s_pos + 1)
-                    if e_pos == -1:
-                        break
-                    # 添加字符串高亮标签
-                    self.editor.tag_add(
-                        "string",
-                        f"{current_line}.{s_pos}",
-                        f"{current_line}.{e_pos + 1}"
-                    )
-                    start_idx = e_pos + 1
-
-            # 3. 关键字和数字高亮（按空格分割token）
-            tokens = line.split()
-            for token in tokens:
-                # 清理token中的标点（如 if: → if，print() → print）
-                clean_token = ''.join(c for c in token if c.isalnum() or c == "_")
-                # 查找token在当前行的起始位置
-                token_start = line.find(token)
-                if token_start == -1:
-                    continue
-                token_end = token_start + len(token)
-
-                # 关键字高亮（使用Python内置keyword模块，准确无遗漏）
-                if iskeyword(clean_token):
-                    self.editor.tag_add(
-                        "keyword",
-                        f"{current_line}.{token_start}",
-                        f"{current_line}.{token_end}"
-                    )
-                # 数字高亮（支持整数/浮点数，如 123、3.14、0.5）
-                elif clean_token.replace(".", "", 1).isdigit():
-                    self.editor.tag_add(
-                        "number",
-                        f"{current_line}.{token_start}",
-                        f"{current_line}.{token_end}"
-                    )
-
-            current_line += 1
-
-    def _mark_modified(self):
-        """标记文件未保存（优化：标题格式统一）"""
-        if not self.is_modified:
-            self.is_modified = True
-            file_name = os.path.basename(self.current_file) if self.current_file else "未命名文件"
+    def _on_buffer_edited(self, buffer):
+        """EditScheduler回调：用户修改后标记未保存（程序化载入内容除外）"""
+        buffer.version += 1
+        self._schedule_check(buffer)
+        if not self._loading_file:
+            buffer.edit_count += 1
+            self._mark_modified(buffer)
+        if buffer is self.buffer:
+            self._schedule_find_refresh()
+
+    def _update_title(self):
+        """按当前标签页刷新窗口标题与状态栏（优化：标题格式统一）"""
+        if self.buffer is None:
+            return
+        file_name = self.buffer.name
+        if self.buffer.is_modified:
             self.root.title(f"Hcode - {file_name} * [Python编辑器]")
             self.status_bar.config(text=f"{file_name} | 未保存 | 按F5运行代码 | Ctrl+L清空控制台")
+        else:
+            self.root.title(f"Hcode - {file_name} [Python编辑器]")
+            self.status_bar.config(text=f"{file_name} | 已保存 | 按F5运行代码 | Ctrl+L清空控制台")
 
-    def _mark_saved(self):
-        """标记文件已保存（优化：标题格式统一）"""
-        self.is_modified = False
-        file_name = os.path.basename(self.current_file) if self.current_file else "未命名文件"
-        self.root.title(f"Hcode - {file_name} [Python编辑器]")
-        self.status_bar.config(text=f"{file_name} | 已保存 | 按F5运行代码 | Ctrl+L清空控制台")
+    def _mark_modified(self, buffer=None):
+        """标记文件未保存（优化：每个标签页独立记录）"""
+        buffer = buffer or self.buffer
+        if not buffer.is_modified:
+            buffer.is_modified = True
+            self._refresh_buffer_views()
 
-    def _check_unsaved(self):
-        """检查未保存内容（保持原有逻辑）"""
-        if self.is_modified:
-            result = messagebox.askyesnocancel("未保存的更改", "当前文件有未保存内容，是否放弃更改？")
+    def _mark_saved(self, buffer=None, disk_state=None):
+        """标记文件已保存（优化：每个标签页独立记录）"""
+        buffer = buffer or self.buffer
+        buffer.is_modified = False
+        buffer.journal.reset(buffer.path)  # 内容已写入磁盘，恢复日志以新文件为基准重新记录
+        self._record_disk_state(buffer, disk_state)
+        self._refresh_buffer_views()
+
+    def _still_loading(self, action):
+        """当前标签页仍在后台载入（大文件模式）时提示并返回 True：此时编辑区只有部分内容，不能保存或运行"""
+        if self.buffer.loading:
+            messagebox.showwarning("正在载入", f"{self.buffer.name} 仍在载入中，请等载入完成后再{action}。")
+            return True
+        return False
+
+    def _check_unsaved(self, buffer=None):
+        """检查未保存内容（默认检查当前标签页）"""
+        buffer = buffer or self.buffer
+        if buffer.is_modified:
+            result = messagebox.askyesnocancel("未保存的更改", f"{buffer.name} 有未保存内容，是否放弃更改？")
             return result if result is not None else False
         return True
 
-    # ========== 基础文件操作（保持原有逻辑，优化中文路径兼容） ==========
-    def new_file(self):
-        if self._check_unsaved():
-            self.current_file = None
-            self.editor.delete("1.0", tk.END)
+    # ========== 标签页：多缓冲区（编辑组件按需创建，长期隐藏的按LRU回收） ==========
+    MAX_LIVE_BUFFERS = 8        # 同时保留编辑组件的标签页数量上限
+    BUFFER_IDLE_SECONDS = 600   # 隐藏超过该时长的标签页回收编辑组件
+    BUFFER_CHECK_MS = 60000     # 检查闲置标签页的间隔
+
+    @property
+    def current_file(self):
+        """当前标签页的文件路径"""
+        return self.buffer.path
+
+    @current_file.setter
+    def current_file(self, value):
+        self.buffer.path = value
+
+    @property
+    def is_modified(self):
+        """当前标签页是否未保存"""
+        return self.buffer.is_modified
+
+    @is_modified.setter
+    def is_modified(self, value):
+        self.buffer.is_modified = value
+
+    def _create_buffer(self, path=None, content="", large=False, activate=True):
+        """新建标签页；编辑组件在标签页首次显示时才创建"""
+        buffer = EditorBuffer(path, content, large)
+        self.buffers.append(buffer)
+        self._add_tab(buffer)
+        if activate:
+            self._activate_buffer(buffer)
+        else:
+            self._refresh_buffer_views()
+        return buffer
+
+    def _ensure_widget(self, buffer):
+        """为缓冲区创建编辑组件；被回收过的缓冲区从快照恢复内容、光标与滚动位置"""
+        if buffer.widget is not None:
+            return
+        # 核心代码编辑框（优化：新增光标色、固定等宽字体）
+        widget = tk.Text(self.edit_container, bg=COLOR_BG_EDITOR, fg=COLOR_FG_TEXT, bd=0, highlightthickness=0,
+                         wrap=tk.NONE, undo=False, font=("Consolas",12),  # 撤销由 UndoLog 管理
+                         insertbackground=COLOR_CURSOR,  # 新增：白色光标，更醒目
+                         yscrollcommand=lambda *args: buffer is self.buffer and self._sync_edit_scroll(*args))
+        if self._ui_ready:  # 启动时创建的编辑框在首帧之后再配置高亮标签
+            self._init_highlight_tags(widget)
+        buffer.widget = widget
+        # 增量高亮引擎通过命令代理获知修改范围，连续修改由 EditScheduler 合并后统一分发
+        buffer.proxy = TextEditProxy(widget)
+        buffer.proxy.recorder = lambda changes: self._record_edit(buffer, changes)
+        buffer.highlighter = SyntaxHighlighter(widget)
+        buffer.highlighter.viewport_only = buffer.large
+        buffer.scheduler = EditScheduler(widget, buffer.proxy)
+        buffer.scheduler.consumers.extend([
+            lambda first, last, delta: self._on_buffer_edited(buffer),
+            lambda first, last, delta: buffer is self.buffer and self._update_line_numbers(),
+            buffer.highlighter.on_edit,
+        ])
+        # 窗口尺寸变化时重绘行号；回车自动缩进
+        widget.bind("<Configure>", lambda e: self._update_line_numbers(), add="+")
+        widget.bind("<Return>", self._auto_indent)
+        # 查找/替换（绑定在编辑框上并阻止Text默认的 Ctrl+F 光标右移 / Ctrl+H 退格）
+        widget.bind("<Control-f>", lambda e: self.show_find())
+        widget.bind("<Control-h>", lambda e: self.show_find(replace=True))
+        # 持久内核：运行当前单元格（阻止Text默认插入换行）
+        widget.bind("<Control-Return>", lambda e: self.run_current_cell())
+        # 切换标签页（阻止Text默认的 Ctrl+PgUp/PgDn 横向滚动一页）
+        widget.bind("<Control-Next>", lambda e: self._cycle_buffer(1))
+        widget.bind("<Control-Prior>", lambda e: self._cycle_buffer(-1))
+        # Text 默认的撤销/重做快捷键改由 UndoLog 处理
+        widget.bind("<<Undo>>", lambda e: self.undo())
+        widget.bind("<<Redo>>", lambda e: self.redo())
+        # 语法检查：鼠标悬停在标记上时在状态栏显示信息
+        for tag in ("lint_error", "lint_warning"):
+            widget.tag_bind(tag, "<Enter>", lambda e: self._show_diagnostic_at(buffer, e))
+            widget.tag_bind(tag, "<Leave>", lambda e: self._update_title())
+        self._fill_widget(buffer, buffer.take_content())
+        index, fraction = buffer.view
+        widget.mark_set(tk.INSERT, index)
+        widget.yview_moveto(fraction)
+        buffer.highlighter.invalidate_all()
+
+    def _fill_widget(self, buffer, content):
+        """整体替换缓冲区内容（程序化修改：不标记未保存，不进入撤销/恢复日志）"""
+        widget = buffer.widget
+        widget.config(state=tk.NORMAL)
+        self._loading_file = True
+        widget.delete("1.0", tk.END)
+        widget.insert("1.0", content)
+        buffer.scheduler.flush()  # 立即分发本次修改，避免稍后被误标为未保存
+        self._loading_file = False
+
+    def _activate_buffer(self, buffer):
+        """切换到指定标签页"""
+        previous = self.buffer
+        if previous is buffer and buffer.widget is not None:
+            return
+        if previous is not None and previous.widget is not None:
+            previous.widget.pack_forget()
+            previous.last_active = time.monotonic()
+        self.buffer = buffer
+        self._ensure_widget(buffer)
+        buffer.widget.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        buffer.last_active = time.monotonic()
+        # 当前标签页的组件与子系统
+        self.editor = buffer.widget
+        self.edit_proxy = buffer.proxy
+        self.highlighter = buffer.highlighter
+        self.edit_scheduler = buffer.scheduler
+        self.gutter.attach(self.editor, buffer.diagnostics)
+        self.edit_scroll.set(*self.editor.yview())
+        self.editor.focus_set()
+        self._refresh_buffer_views()
+        self._evict_buffers()
+
+    def _open_buffer(self, path, content, large=False, activate=True):
+        """在标签页中显示文件内容；当前标签页是未修改的空白未命名文件时直接复用
+
+        activate 为假时只添加标签页，编辑组件等到首次切换到该标签页时才创建。
+        """
+        buffer = self.buffer
+        if (buffer is not None and buffer.path is None and not buffer.is_modified
+                and buffer.widget is not None and buffer.widget.compare("end-1c", "==", "1.0")):
+            buffer.path = path
+            buffer.large = large
+            buffer.highlighter.viewport_only = large
+            self._fill_widget(buffer, content)
+            buffer.undo_log.reset()
+            buffer.journal.reset(path)
+            buffer.highlighter.invalidate_all()
+            self._refresh_buffer_views()
+        else:
+            buffer = self._create_buffer(path, content, large, activate)
+        if not large:  # 大文件载入完成时由 _mark_saved 记录
+            self._record_disk_state(buffer)
+        return buffer
+
+    def _find_buffer(self, path):
+        path = os.path.abspath(path)
+        for buffer in self.buffers:
+            if buffer.path and os.path.abspath(buffer.path) == path:
+                return buffer
+        return None
+
+    def close_buffer(self, buffer=None):
+        """关闭标签页（默认当前标签页）；关闭最后一个时自动新建空白标签页"""
+        buffer = buffer or self.buffer
+        if not self._check_unsaved(buffer):
+            return
+        buffer.load_token = None
+        if buffer.check_job is not None:
+            self.root.after_cancel(buffer.check_job)
+        buffer.check_generation += 1
+        if buffer.widget is not None:
+            buffer.highlighter.cancel()
+            buffer.proxy.close()
+            buffer.widget.destroy()
+            buffer.widget = None
+        buffer.discard_snapshot()
+        buffer.journal.discard()
+        index = self.buffers.index(buffer)
+        self.buffers.remove(buffer)
+        self._tabs.pop(buffer)[0].destroy()
+        if buffer is self.buffer:
+            self.buffer = None
+            if self.buffers:
+                self._activate_buffer(self.buffers[min(index, len(self.buffers) - 1)])
+            else:
+                self._create_buffer()
+        else:
+            self._refresh_buffer_views()
+
+    def _cycle_buffer(self, step):
+        index = self.buffers.index(self.buffer)
+        self._activate_buffer(self.buffers[(index + step) % len(self.buffers)])
+        return "break"
+
+    def _release_widget(self, buffer):
+        """回收隐藏标签页的编辑组件：内容存为快照（撤销日志保存在缓冲区中，不受影响）"""
+        widget = buffer.widget
+        buffer.scheduler.flush()
+        buffer.view = (widget.index(tk.INSERT), widget.yview()[0])
+        buffer.store_snapshot(widget.get("1.0", "end-1c"))
+        buffer.highlighter.cancel()
+        buffer.proxy.close()
+        widget.destroy()
+        buffer.widget = buffer.proxy = buffer.highlighter = buffer.scheduler = None
+        buffer.search_cache = None  # 查找缓存含未压缩的全文，重新创建组件后也会失效
+
+    def _evict_buffers(self):
+        """按LRU回收：超过 MAX_LIVE_BUFFERS 或隐藏超过 BUFFER_IDLE_SECONDS 的标签页释放编辑组件"""
+        now = time.monotonic()
+        live = [b for b in self.buffers if b.widget is not None and b is not self.buffer and not b.loading]
+        live.sort(key=lambda b: b.last_active)  # 最久未使用的在前
+        excess = len(live) + 1 - self.MAX_LIVE_BUFFERS
+        for index, buffer in enumerate(live):
+            if index < excess or now - buffer.last_active > self.BUFFER_IDLE_SECONDS:
+                self._release_widget(buffer)
+
+    def _evict_idle_buffers(self):
+        self._evict_buffers()
+        self.root.after(self.BUFFER_CHECK_MS, self._evict_idle_buffers)
+
+    def _add_tab(self, buffer):
+        tab = tk.Frame(self.tab_bar, bg=COLOR_BG_SIDEBAR)
+        tab.pack(side=tk.LEFT, padx=(0, 1))
+        label = tk.Label(tab, bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, padx=10, pady=3, font=("Arial",9))
+        label.pack(side=tk.LEFT)
+        close = tk.Label(tab, text="×", bg=COLOR_BG_SIDEBAR, fg=COLOR_FG_TEXT, padx=4, font=("Arial",9))
+        close.pack(side=tk.LEFT)
+        label.bind("<Button-1>", lambda e: self._activate_buffer(buffer))
+        close.bind("<Button-1>", lambda e: self.close_buffer(buffer))
+        self._tabs[buffer] = (tab, label, close)
+
+    def _refresh_buffer_views(self):
+        """同步标签栏、侧边栏打开文件列表、窗口标题与状态栏"""
+        for buffer, (tab, label, close) in self._tabs.items():
+            bg = COLOR_BG_EDITOR if buffer is self.buffer else COLOR_BG_SIDEBAR
+            label.config(text=buffer.name + (" ●" if buffer.is_modified else ""), bg=bg)
+            tab.config(bg=bg)
+            close.config(bg=bg)
+        if self.file_list is not None:  # 侧边栏在首帧显示后才创建
             self.file_list.delete(0, tk.END)
-            self._mark_saved()
-            self._update_line_numbers()
+            for buffer in self.buffers:
+                self.file_list.insert(tk.END, buffer.name)
+            if self.buffer in self.buffers:
+                self.file_list.selection_set(self.buffers.index(self.buffer))
+        self._update_title()
+
+    def _on_file_list_select(self, event=None):
+        selection = self.file_list.curselection()
+        if selection and selection[0] < len(self.buffers):
+            self._activate_buffer(self.buffers[selection[0]])
+
+    # ========== 基础文件操作（优化：大文件后台分块载入，保存改为原子写入） ==========
+    LARGE_FILE_BYTES = 5 * 1024 * 1024  # 超过该大小按大文件模式打开/后台保存
+    LOAD_CHUNK_CHARS = 256 * 1024       # 大文件每块读取/插入的字符数
+
+    def new_file(self):
+        """新建空白标签页"""
+        self._create_buffer()
 
     def open_file(self):
-        if self._check_unsaved():
-            file_path = filedialog.askopenfilename(
-                title="打开文件",
-                filetypes=[("Python文件", "*.py"), ("文本文件", "*.txt"), ("所有文件", "*.*")]
-            )
-            if file_path:
+        file_path = filedialog.askopenfilename(
+            title="打开文件",
+            filetypes=[("Python文件", "*.py"), ("文本文件", "*.txt"), ("所有文件", "*.*")]
+        )
+        if file_path:
+            self._load_file(file_path)
+
+    def _open_paths(self, paths):
+        """打开命令行指定的路径：文件夹作为工作区，文件在标签页中打开，不存在的文件新建为同名标签页
+
+        只切换到最后一个文件，其余文件在后台标签页中打开，编辑组件等到首次查看时才创建。
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        files = [path for path in paths if not os.path.isdir(path)]
+        for path in paths:
+            activate = bool(files) and path == files[-1]
+            if os.path.isdir(path):
+                self._open_workspace(path)
+            elif os.path.exists(path):
+                self._load_file(path, activate)
+            else:
+                self._open_buffer(path, "", activate=activate)
+
+    def _load_file(self, file_path, activate=True):
+        """在标签页中打开文件：已打开则直接切换；超过 LARGE_FILE_BYTES 时改为后台分块载入
+
+        activate 为假时在后台标签页中打开（不创建编辑组件）；大文件需要组件接收载入的内容，总是切换过去。
+        """
+        buffer = self._find_buffer(file_path)
+        if buffer is not None:
+            if activate:
+                self._activate_buffer(buffer)
+            return
+        try:
+            if os.path.getsize(file_path) > self.LARGE_FILE_BYTES:
+                self._load_large_file(file_path)
+                return
+            # 强制UTF-8编码，确保中文内容/路径无乱码
+            with open(file_path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except Exception as e:
+            messagebox.showerror("打开失败", f"错误：{str(e)}")
+            return
+        self._open_buffer(file_path, content, activate=activate)
+
+    def _load_large_file(self, file_path):
+        """大文件模式：后台线程分块读取，主线程逐块插入并在状态栏显示进度，只高亮可见区域"""
+        size = os.path.getsize(file_path)
+        buffer = self._open_buffer(file_path, "", large=True)
+        buffer.loading = True
+        # 载入期间禁止编辑，且不记录撤销历史（避免内存翻倍）
+        buffer.widget.config(state=tk.DISABLED, undo=False)
+        token = buffer.load_token = object()
+        chunks = queue.Queue(maxsize=8)
+
+        def put(item):
+            while token is buffer.load_token:
                 try:
-                    # 强制UTF-8编码，确保中文内容/路径无乱码
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                    self.editor.delete("1.0", tk.END)
-                    self.editor.insert("1.0", content)
-                    self.current_file = file_path
-                    self.file_list.delete(0, tk.END)
-                    self.file_list.insert(0, os.path.basename(file_path))
-                    self._mark_saved()
-                    self._update_line_numbers()
-                    self._syntax_highlight()  # 打开文件后立即高亮
-                except Exception as e:
-                    messagebox.showerror("打开失败", f"错误：{str(e)}")
+                    chunks.put(item, timeout=0.2)
+                    return True
+                except queue.Full:
+                    pass
+            return False
 
-    def save_file(self):
-        if self.current_file:
+        def reader():
             try:
-                content = self.editor.get("1.0", tk.END)
-                # 强制UTF-8编码，保存中文无乱码
-                with open(self.current_file, "w", encoding="utf-8") as f:
-                    f.write(content)
-                self._mark_saved()
-                messagebox.showinfo("保存成功", f"已保存至：\n{self.current_file}")
+                with open(file_path, "r", encoding="utf-8") as f:
+                    while True:
+                        data = f.read(self.LOAD_CHUNK_CHARS)
+                        if not data or not put((data, f.buffer.tell())):
+                            break
+                put(None)
             except Exception as e:
-                messagebox.showerror("保存失败", f"错误：{str(e)}")
+                put(e)
+
+        threading.Thread(target=reader, daemon=True).start()
+        self.root.after(15, self._poll_large_load, buffer, token, chunks, size)
+
+    def _poll_large_load(self, buffer, token, chunks, size):
+        if token is not buffer.load_token:
+            return  # 标签页已关闭
+        widget = buffer.widget
+        deadline = time.perf_counter() + 0.03  # 单次最多占用主线程约30ms
+        while time.perf_counter() < deadline:
+            try:
+                item = chunks.get_nowait()
+            except queue.Empty:
+                break
+            if item is None or isinstance(item, Exception):
+                buffer.load_token = None
+                buffer.loading = False
+                widget.config(state=tk.NORMAL)
+                if item is not None:
+                    # 读取中途失败（如文件后部有非UTF-8字节）：与小文件一样不保留标签页，
+                    # 否则只含部分内容的标签页被当作已保存，再次保存会截断磁盘上的文件
+                    buffer.is_modified = False
+                    self.close_buffer(buffer)
+                    messagebox.showerror("打开失败", f"错误：{str(item)}")
+                    return
+                buffer.undo_log.reset()
+                self._mark_saved(buffer)
+                return
+            data, done = item
+            widget.config(state=tk.NORMAL)
+            self._loading_file = True
+            widget.insert(tk.END, data)
+            buffer.scheduler.flush()
+            self._loading_file = False
+            widget.config(state=tk.DISABLED)
+            if buffer is self.buffer:
+                progress = min(done * 100 // max(size, 1), 100)
+                self.status_bar.config(text=f"{buffer.name} | 正在载入（大文件模式）：{progress}%")
+        self.root.after(15, self._poll_large_load, buffer, token, chunks, size)
+
+    def _run_in_background(self, func, on_done, poll_ms=50):
+        """在后台线程池执行 func，完成后在主线程回调 on_done(结果, 异常)；返回 Future，取消后不再回调"""
+        future = self.executor.submit(func)
+
+        def poll():
+            if not future.done():
+                self.root.after(poll_ms, poll)
+            elif not future.cancelled():
+                on_done(None if future.exception() else future.result(), future.exception())
+
+        self.root.after(poll_ms, poll)
+        return future
+
+    def _write_buffer(self, file_path, title):
+        """把编辑区内容原子写入文件；内容较大时在后台线程写入，避免阻塞界面"""
+        buffer = self.buffer
+        content = buffer.widget.get("1.0", "end-1c")  # 不再额外追加Text末尾的换行
+        edit_count = buffer.edit_count
+
+        def done(result, error):
+            buffer.saving = False
+            if error is not None:
+                messagebox.showerror("保存失败", f"错误：{str(error)}")
+                return
+            buffer.path = file_path
+            if buffer.edit_count == edit_count:  # 保存期间没有新的修改
+                self._mark_saved(buffer)
+            else:
+                self._record_disk_state(buffer)  # 仍未保存，但磁盘上的新内容是自己写入的，不算外部修改
+                self._refresh_buffer_views()
+            messagebox.showinfo(title, f"已保存至：\n{file_path}")
+
+        if len(content) > self.LARGE_FILE_BYTES:
+            self.status_bar.config(text=f"{os.path.basename(file_path)} | 正在保存...")
+            buffer.saving = True
+            self._run_in_background(lambda: _atomic_write(file_path, content), done)
+            return
+        try:
+            _atomic_write(file_path, content)
+        except Exception as e:
+            done(None, e)
+        else:
+            done(None, None)
+
+    def save_file(self):
+        if self._still_loading("保存"):
+            return
+        if self.current_file:
+            if self._disk_changed(self.buffer) and not messagebox.askyesno(
+                    "文件已在外部修改", f"{self.buffer.name} 在载入后已被其他程序修改。\n仍要用编辑器中的内容覆盖吗？"):
+                return
+            self._write_buffer(self.current_file, "保存成功")
         else:
             self.save_as_file()
 
     def save_as_file(self):
+        if self._still_loading("保存"):
+            return
         file_path = filedialog.asksaveasfilename(
             title="另存为",
             defaultextension=".py",
             filetypes=[("Python文件", "*.py"), ("文本文件", "*.txt"), ("所有文件", "*.*")]
         )
         if file_path:
+            self._write_buffer(file_path, "另存为成功")
+
+    # ========== 工作区：打开文件夹 + 懒加载目录树 ==========
+    def open_folder(self):
+        folder = filedialog.askdirectory(title="打开文件夹")
+        if folder:
+            self._open_workspace(folder)
+
+    def _open_workspace(self, folder):
+        """以文件夹为工作区：只扫描根目录，子目录展开时再扫描"""
+        self.workspace = WorkspaceScanner(folder)
+        self._loaded_dirs.clear()
+        tree = self.workspace_tree
+        tree.delete(*tree.get_children())
+        root_path = self.workspace.root
+        tree.insert("", tk.END, iid=root_path, text=os.path.basename(root_path) or root_path,
+                    open=True, tags=("dir",))
+        if not tree.winfo_ismapped():
+            self.file_list.pack_configure(expand=False)
+            self.file_list.config(height=5)
+            tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self._expand_dir(root_path)
+
+    def _expand_dir(self, path):
+        scanner = self.workspace
+        self._loaded_dirs.add(path)
+        self._run_in_background(lambda: scanner.list_dir(path),
+                                lambda entries, error: self._fill_dir(scanner, path, entries, error))
+
+    def _fill_dir(self, scanner, path, entries, error):
+        """把目录条目同步到树节点：只增删有变化的子项，保留已展开子目录的状态"""
+        tree = self.workspace_tree
+        if scanner is not self.workspace or not tree.exists(path):
+            return  # 已切换工作区或节点已删除
+        if error is not None:
+            self._loaded_dirs.discard(path)
+            self.status_bar.config(text=f"无法读取目录：{path}（{error}）")
+            return
+        wanted = {entry_path for _, entry_path, _ in entries}
+        stale = [iid for iid in tree.get_children(path) if iid not in wanted]
+        if stale:
+            tree.delete(*stale)
+            self._loaded_dirs.difference_update(stale)
+        for index, (name, entry_path, is_dir) in enumerate(entries):
+            if tree.exists(entry_path):
+                tree.move(entry_path, path, index)
+                continue
+            tree.insert(path, index, iid=entry_path, text=name, tags=("dir" if is_dir else "file",))
+            if is_dir:
+                # 占位子项：让目录显示展开箭头，真正展开时再扫描
+                tree.insert(entry_path, tk.END, iid="placeholder:" + entry_path, text="…")
+
+    def _on_tree_open(self, event=None):
+        path = self.workspace_tree.focus()
+        if path and path not in self._loaded_dirs and self.workspace_tree.tag_has("dir", path):
+            self._expand_dir(path)
+
+    def _on_tree_activate(self, event=None):
+        path = self.workspace_tree.focus()
+        if path and self.workspace_tree.tag_has("file", path):
+            self._load_file(path)
+
+    def refresh_workspace(self):
+        """增量刷新：只重新扫描 mtime 发生变化的已展开目录；返回后台任务的 Future"""
+        scanner = self.workspace
+        if scanner is None:
+            return None
+        dirs = list(self._loaded_dirs)
+
+        def scan():
+            full = scanner.reload_ignore()  # .gitignore 变化后缓存已清空，全部重新列出
+            return {path: scanner.list_dir(path) for path in dirs
+                    if (full or scanner.changed(path)) and os.path.isdir(path)}
+
+        def done(changed, error):
+            if error is not None:
+                self.status_bar.config(text=f"刷新工作区失败：{error}")
+                return
+            for path, entries in changed.items():
+                self._fill_dir(scanner, path, entries, None)
+
+        return self._run_in_background(scan, done)
+
+    # ========== 外部修改检测：定时检查已打开文件与工作区，变化后按行差异重新载入 ==========
+    WATCH_MS = 1000  # 检查间隔（每个已打开文件一次 stat；工作区只重新扫描 mtime 变化的已展开目录）
+
+    def _record_disk_state(self, buffer, state=None):
+        """记录磁盘文件的基准状态 (stat签名, 内容哈希)；未给出时立即取签名，在后台计算哈希"""
+        buffer.disk_conflict = False
+        if state is not None:
+            buffer.disk_signature, buffer.disk_digest = state
+            return
+        path = buffer.path
+        buffer.disk_signature = _file_signature(path) if path else None
+        buffer.disk_digest = None
+        if buffer.disk_signature is None:
+            return
+
+        def done(result, error):
+            if error is None and buffer.path == path and result[0] == buffer.disk_signature:
+                buffer.disk_digest = result[1]
+
+        self._run_in_background(lambda: _read_disk(path, decode=False), done)
+
+    def _disk_changed(self, buffer):
+        """磁盘上的文件在上次载入/保存后是否被其他程序改过（签名变化且内容哈希不同）"""
+        if buffer.disk_conflict:
+            return True
+        signature = _file_signature(buffer.path)
+        if signature is None or buffer.disk_signature is None or signature == buffer.disk_signature:
+            return False
+        try:
+            return buffer.disk_digest is None or _read_disk(buffer.path, decode=False)[1] != buffer.disk_digest
+        except OSError:
+            return False
+
+    def _watch_files(self):
+        """定时检查：stat 签名变化的已打开文件在后台读取并比较哈希，工作区做一次增量刷新"""
+        for buffer in self.buffers:
+            if buffer.path is None or buffer.loading or buffer.saving or buffer.watch_pending:
+                continue
+            signature = _file_signature(buffer.path)
+            if signature == buffer.disk_signature:
+                continue
+            if signature is None:
+                buffer.disk_signature = buffer.disk_digest = None
+                if buffer is self.buffer:
+                    self.status_bar.config(text=f"{buffer.name} | 文件已在磁盘上被删除或移动")
+                continue
+            buffer.watch_pending = True
+            path, version = buffer.path, buffer.version
+            old = buffer.widget.get("1.0", "end-1c") if buffer.widget is not None else None
+
+            def read(path=path, old=old, digest=buffer.disk_digest):
+                signature, new_digest, text = _read_disk(path)
+                if new_digest == digest:
+                    return signature, new_digest, None, None  # 只有时间戳变化（如 touch）
+                return signature, new_digest, text, (_diff_lines(old, text) if old is not None else None)
+
+            self._run_in_background(
+                read, lambda result, error, b=buffer, p=path, v=version: self._on_disk_changed(b, p, v, result, error))
+        if self.workspace is not None and (self._workspace_watch is None or self._workspace_watch.done()):
+            self._workspace_watch = self.refresh_workspace()
+        self.root.after(self.WATCH_MS, self._watch_files)
+
+    def _on_disk_changed(self, buffer, path, version, result, error):
+        try:
+            if buffer not in self.buffers or buffer.path != path:
+                return  # 标签页已关闭或已另存为其他文件
+            if error is not None:
+                buffer.disk_signature = _file_signature(path)  # 读取失败（如编码错误）时不再反复重试
+                if buffer is self.buffer:
+                    self.status_bar.config(text=f"{buffer.name} | 无法读取磁盘上的新内容：{error}")
+                return
+            signature, digest, text, changes = result
+            if text is None:
+                buffer.disk_signature = signature
+                return
+            if buffer.version != version and buffer.widget is not None:
+                changes = _diff_lines(buffer.widget.get("1.0", "end-1c"), text)  # 读取期间内容有变化
+            if changes == []:  # 与编辑器中的内容相同
+                self._mark_saved(buffer, (signature, digest))
+                return
+            if buffer.is_modified and not messagebox.askyesno(
+                    "文件已在外部修改", f"{buffer.name} 已被其他程序修改。\n是否重新载入？（将丢弃编辑器中未保存的修改）"):
+                buffer.disk_signature, buffer.disk_digest = signature, digest
+                buffer.disk_conflict = True
+                return
+            self._reload_buffer(buffer, text, changes)
+            self._mark_saved(buffer, (signature, digest))
+            if buffer is self.buffer:
+                self.status_bar.config(text=f"{buffer.name} | 已重新载入（文件在外部被修改）")
+        finally:
+            buffer.watch_pending = False
+
+    def _reload_buffer(self, buffer, text, changes):
+        """用磁盘上的新内容更新标签页：只替换有变化的行，光标、滚动位置和其余行的高亮缓存保持不变"""
+        buffer.undo_log.reset()
+        if buffer.widget is None:  # 编辑组件已回收（或尚未创建），直接替换保存的内容
+            buffer.discard_snapshot()
+            buffer._text = text
+            buffer.version += 1
+            return
+        widget = buffer.widget
+        if changes is None:
+            changes = _diff_lines(widget.get("1.0", "end-1c"), text)
+        total = int(widget.index("end-1c").split(".")[0])
+        widget.mark_set("reload_top", "@0,0")
+        widget.mark_gravity("reload_top", tk.LEFT)
+        self._loading_file = True
+        try:
+            for first, last, new in reversed(changes):  # 从后往前改，前面的行号不受影响
+                if new is None:  # 删除整行（连同一个换行符）
+                    if last < total:
+                        widget.delete(f"{first + 1}.0", f"{last + 1}.0")
+                    elif first > 0:
+                        widget.delete(f"{first}.end", f"{last}.end")
+                    else:
+                        widget.delete("1.0", f"{last}.end")
+                elif first == last:  # 插入整行
+                    if first < total:
+                        widget.insert(f"{first + 1}.0", new + "\n")
+                    else:
+                        widget.insert(f"{total}.end", "\n" + new)
+                else:
+                    widget.replace(f"{first + 1}.0", f"{last}.end", new)
+            buffer.scheduler.flush()
+        finally:
+            self._loading_file = False
+        widget.yview("reload_top")
+        widget.mark_unset("reload_top")
+
+    # ========== 查找/替换 + 在文件中查找 ==========
+    FIND_HIGHLIGHT_ALL_LINES = 20000  # 超过该行数（或大文件模式）时只高亮可见区域内的匹配
+    FIND_MAX_FILE_RESULTS = 200       # 在文件中查找：单个文件最多报告的行数
+    FIND_MAX_RESULTS = 5000           # 在文件中查找：总结果数上限
+    FIND_REFRESH_MS = 300             # 修改停止多久后重新标记全部匹配（之前只更新可见区域）
+
+    def show_find(self, replace=False):
+        """显示查找栏（Ctrl+F），replace 为真时同时显示替换栏（Ctrl+H）"""
+        if self.find_bar is None:
+            self._init_find_bar(self.right_frame)
+        if not self.find_bar.winfo_ismapped():
+            self.find_bar.pack(fill=tk.X, padx=5, before=self.edit_container)
+        if replace:
+            self.replace_row.pack(fill=tk.X)
+        else:
+            self.replace_row.pack_forget()
+        try:
+            selected = self.editor.get(tk.SEL_FIRST, tk.SEL_LAST)
+            if selected and "\n" not in selected:
+                self.find_var.set(selected)
+        except tk.TclError:
+            pass  # 没有选中内容
+        self.find_entry.focus_set()
+        self.find_entry.select_range(0, tk.END)
+        self._refresh_find_highlight()
+        return "break"
+
+    def hide_find(self):
+        self.find_bar.pack_forget()
+        self.editor.tag_remove("find_match", "1.0", tk.END)
+        self.editor.tag_remove("find_current", "1.0", tk.END)
+        self.editor.focus_set()
+        for buffer in self.buffers:
+            buffer.search_cache = None  # 关闭查找栏后不再保留全文副本与行索引
+
+    def _find_pattern(self):
+        """按查找栏选项编译正则；查找内容为空或正则有误时返回 None"""
+        query = self.find_var.get()
+        if not query:
+            self.find_status.config(text="")
+            return None
+        flags = 0 if self.find_case_var.get() else re.IGNORECASE
+        try:
+            return re.compile(query if self.find_regex_var.get() else re.escape(query), flags | re.MULTILINE)
+        except re.error as e:
+            self.find_status.config(text=f"正则错误：{e}")
+            return None
+
+    def _buffer_text_index(self):
+        """当前标签页的全文与行偏移索引，内容未变化时复用缓存"""
+        buffer = self.buffer
+        cached = buffer.search_cache
+        if cached is None or cached[0] != buffer.version:
+            text = self.editor.get("1.0", "end-1c")
+            cached = buffer.search_cache = (buffer.version, text, LineIndex(text))
+        return cached[1], cached[2]
+
+    def _schedule_find_refresh(self):
+        """修改后只重新标记可见区域内的匹配；停止修改 FIND_REFRESH_MS 后再刷新全部匹配与计数"""
+        if self.find_bar is None or not self.find_bar.winfo_ismapped():
+            return
+        pattern = self._find_pattern()
+        if pattern is not None:
+            self._highlight_visible_matches(pattern)
+        if self._find_refresh_job is not None:
+            self.root.after_cancel(self._find_refresh_job)
+        self._find_refresh_job = self.root.after(self.FIND_REFRESH_MS, self._refresh_find_highlight)
+
+    def _highlight_visible_matches(self, pattern):
+        """只在可见行范围内重新标记匹配，返回匹配数"""
+        editor = self.editor
+        first = int(editor.index("@0,0").split(".")[0])
+        last = int(editor.index(f"@0,{editor.winfo_height()}").split(".")[0])
+        editor.tag_remove("find_match", f"{first}.0", f"{last}.end")
+        text = editor.get(f"{first}.0", f"{last}.end")
+        index = LineIndex(text)
+        count = 0
+        for m in pattern.finditer(text):
+            if m.end() > m.start():
+                start, end = index.position(m.start()), index.position(m.end())
+                editor.tag_add("find_match", f"{start[0] + first - 1}.{start[1]}", f"{end[0] + first - 1}.{end[1]}")
+                count += 1
+        return count
+
+    def _refresh_find_highlight(self):
+        """高亮所有匹配；行数很多或大文件模式时只处理可见区域"""
+        if self._find_refresh_job is not None:
+            self.root.after_cancel(self._find_refresh_job)
+            self._find_refresh_job = None
+        if self.find_bar is None or not self.find_bar.winfo_ismapped():
+            return
+        editor = self.editor
+        editor.tag_remove("find_match", "1.0", tk.END)
+        pattern = self._find_pattern()
+        if pattern is None:
+            return
+        line_count = int(editor.index("end-1c").split(".")[0])
+        if self.buffer.large or line_count > self.FIND_HIGHLIGHT_ALL_LINES:
+            count = self._highlight_visible_matches(pattern)
+            self.find_status.config(text=f"可见区域 {count} 处匹配")
+            return
+        text, index = self._buffer_text_index()
+        args = []
+        for m in pattern.finditer(text):
+            if m.end() > m.start():
+                args.extend(("%d.%d" % index.position(m.start()), "%d.%d" % index.position(m.end())))
+        for start in range(0, len(args), 2000):  # 分批调用 tag add，减少Tcl调用次数
+            editor.tag_add("find_match", *args[start:start + 2000])
+        self.find_status.config(text=f"{len(args) // 2} 处匹配")
+
+    def find_next(self, backward=False):
+        """从光标处查找下一处（backward 为真时查找上一处），到达末尾后回绕"""
+        pattern = self._find_pattern()
+        if pattern is None:
+            return "break"
+        text, index = self._buffer_text_index()
+        line, column = map(int, self.editor.index(tk.INSERT).split("."))
+        cursor = index.offset(line, column)
+        match = None
+        if backward:
+            # 光标位于上次匹配末尾时，跳过该匹配本身
             try:
-                content = self.editor.get("1.0", tk.END)
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-                self.current_file = file_path
-                self.file_list.delete(0, tk.END)
-                self.file_list.insert(0, os.path.basename(file_path))
-                self._mark_saved()
-                messagebox.showinfo("另存为成功", f"已保存至：\n{self.current_file}")
-            except Exception as e:
-                messagebox.showerror("保存失败", f"错误：{str(e)}")
+                cursor = index.offset(*map(int, self.editor.index(tk.SEL_FIRST).split(".")))
+            except tk.TclError:
+                pass
+            matches = [m for m in pattern.finditer(text) if m.end() > m.start()]
+            before = [m for m in matches if m.start() < cursor]
+            match = (before or matches or [None])[-1]
+        else:
+            for start in (cursor, 0):
+                match = next((m for m in pattern.finditer(text, start) if m.end() > m.start()), None)
+                if match:
+                    break
+        if match is None:
+            self.find_status.config(text="无匹配")
+            return "break"
+        start = "%d.%d" % index.position(match.start())
+        end = "%d.%d" % index.position(match.end())
+        editor = self.editor
+        editor.tag_remove("sel", "1.0", tk.END)
+        editor.tag_remove("find_current", "1.0", tk.END)
+        editor.tag_add("sel", start, end)
+        editor.tag_add("find_current", start, end)
+        editor.mark_set(tk.INSERT, end)
+        editor.see(start)
+        return "break"
 
-    # ========== 核心功能：运行代码 + 控制台操作（保持原有逻辑） ==========
-    def run_code(self):
-        """运行编辑区的Python代码，结果/错误输出到控制台"""
-        self.console_insert(f"\n{'='*50}\n【运行开始】{os.path.basename(self.current_file) if self.current_file else '未命名文件'}\n{'='*50}\n")
+    def replace_one(self):
+        """替换当前选中的匹配，然后跳到下一处"""
+        pattern = self._find_pattern()
+        if pattern is None:
+            return
         try:
-            code = self.editor.get("1.0", tk.END).strip()
-            if not code:
-                self.console_insert("⚠️  错误：编辑区无代码可运行！\n", is_error=True)
+            start, end = self.editor.index(tk.SEL_FIRST), self.editor.index(tk.SEL_LAST)
+        except tk.TclError:
+            self.find_next()
+            return
+        match = pattern.fullmatch(self.editor.get(start, end))
+        if match:
+            replacement = match.expand(self.replace_var.get()) if self.find_regex_var.get() else self.replace_var.get()
+            self.editor.delete(start, end)
+            self.editor.insert(start, replacement)
+            self.editor.mark_set(tk.INSERT, f"{start}+{len(replacement)}c")
+        self.find_next()
+
+    def replace_all(self):
+        """全部替换（从后往前逐处替换，整体作为一步撤销）"""
+        pattern = self._find_pattern()
+        if pattern is None:
+            return
+        text, index = self._buffer_text_index()
+        matches = [m for m in pattern.finditer(text) if m.end() > m.start()]
+        editor = self.editor
+        for m in reversed(matches):
+            replacement = m.expand(self.replace_var.get()) if self.find_regex_var.get() else self.replace_var.get()
+            start = "%d.%d" % index.position(m.start())
+            end = "%d.%d" % index.position(m.end())
+            editor.delete(start, end)
+            editor.insert(start, replacement)
+        self.find_status.config(text=f"已替换 {len(matches)} 处")
+
+    def find_in_files(self):
+        """在工作区（未打开文件夹时为当前文件所在目录）的所有文件中查找，结果逐步输出到控制台"""
+        if self.find_bar is None or not self.find_var.get():
+            self.show_find()  # 先输入要查找的内容
+            return
+        pattern = self._find_pattern()
+        if pattern is None:
+            return
+        if self.workspace is not None:
+            scanner = self.workspace
+        elif self.current_file:
+            scanner = WorkspaceScanner(os.path.dirname(os.path.abspath(self.current_file)))
+        else:
+            self.find_status.config(text="请先打开文件夹或保存当前文件")
+            return
+        token = self._search_token = object()
+        results = queue.Queue()
+        self.console_insert(f"\n🔍 在 {scanner.root} 中查找：{pattern.pattern}\n")
+
+        def search_tree():
+            """遍历目录（复用工作区扫描缓存与忽略规则），逐个文件提交给线程池搜索"""
+            pending = []
+            stack = [scanner.root]
+            while stack and token is self._search_token:
+                try:
+                    entries = scanner.list_dir(stack.pop())
+                except OSError:
+                    continue
+                for name, path, is_dir in entries:
+                    if is_dir:
+                        stack.append(path)
+                    else:
+                        pending.append(self.executor.submit(self.file_search_index.search, path, pattern,
+                                                            self.FIND_MAX_FILE_RESULTS))
+                        pending[-1].path = path
+            total = 0
+            for future in pending:
+                if token is not self._search_token or total >= self.FIND_MAX_RESULTS:
+                    future.cancel()
+                    continue
+                try:
+                    hits = future.result()
+                except Exception:
+                    continue
+                if hits:
+                    total += len(hits)
+                    results.put((future.path, hits))
+            results.put(None)
+
+        threading.Thread(target=search_tree, daemon=True).start()
+        self.root.after(50, self._poll_find_results, token, results, 0, 0)
+
+    def _poll_find_results(self, token, results, files, hits):
+        if token is not self._search_token:
+            return
+        while True:
+            try:
+                item = results.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.console_insert(f"🔍 查找完成：{files} 个文件，{hits} 处匹配\n")
                 return
-            local_namespace = {}
-            exec(code, globals(), local_namespace)
-            self.console_insert(f"\n✅ 运行成功！无报错信息\n")
-        except SyntaxError as e:
-            error_info = f"❌ 语法错误 - 第{e.lineno}行：{e.msg}\n错误代码：{e.text or '未知'}\n"
-            self.console_insert(error_info, is_error=True)
-        except Exception as e:
-            error_info = f"❌ 运行时错误：{type(e).__name__} - {str(e)}\n"
-            error_info += traceback.format_exc()
-            self.console_insert(error_info, is_error=True)
+            path, matches = item
+            files += 1
+            hits += len(matches)
+            for line, column, content in matches:
+                self.console_sink.write(f"{path}:{line}:{column + 1}", "link")
+                self.console_sink.write(f": {content[:200]}\n")
+        self.root.after(50, self._poll_find_results, token, results, files, hits)
+
+    def _on_console_link(self, event):
+        """点击控制台中的 文件:行:列 跳转到对应位置"""
+        index = self.console.index(f"@{event.x},{event.y}")
+        text = self.console.get(f"{index} linestart", f"{index} lineend")
+        m = re.match(r"(.+?):(\d+):(\d+)", text)
+        if m:
+            self._open_location(m.group(1), int(m.group(2)), int(m.group(3)) - 1)
+
+    def _open_location(self, path, line, column=0):
+        """打开文件并把光标移动到指定行列"""
+        self._load_file(path)
+        buffer = self._find_buffer(path)
+        if buffer is not None and buffer is self.buffer:
+            self._goto_line(line, column)
+
+    def _goto_line(self, line, column=0):
+        """把当前编辑框的光标移动到指定行列并滚动到可见"""
+        self.editor.mark_set(tk.INSERT, f"{line}.{column}")
+        self.editor.see(tk.INSERT)
+        self.editor.focus_set()
+
+    # ========== 撤销/重做 + 崩溃恢复 ==========
+    JOURNAL_FLUSH_MS = 1000  # 恢复日志的写盘间隔
+
+    def _record_edit(self, buffer, changes):
+        """TextEditProxy 在每次修改后回调：写入恢复日志；用户修改同时进入撤销日志"""
+        if self._loading_file:
+            return  # 载入/恢复组件内容不算修改
+        buffer.journal.record(changes)
+        if self._journal_job is None:
+            self._journal_job = self.root.after(self.JOURNAL_FLUSH_MS, self._flush_journals)
+        if self._replaying:
+            return
+        if changes and changes[0][0] == "s":
+            buffer.undo_log.reset()  # 无法描述的修改：之前的撤销记录已不再适用
+        elif buffer.undo_log.record(changes, time.monotonic()):
+            buffer.widget.after_idle(buffer.undo_log.close_group)
+
+    def _flush_journals(self):
+        self._journal_job = None
+        for buffer in self.buffers:
+            try:
+                buffer.journal.flush()
+            except OSError as e:
+                buffer.journal.pending = []
+                if not self._journal_error:
+                    self._journal_error = True
+                    self.console_insert(f"⚠️  无法写入崩溃恢复日志：{e}\n", is_error=True)
+
+    def undo(self):
+        buffer = self.buffer
+        if buffer.widget is not None and not buffer.loading:
+            group = buffer.undo_log.undo()
+            if group:
+                self._replay_group(buffer, group, undo=True)
+        return "break"
+
+    def redo(self):
+        buffer = self.buffer
+        if buffer.widget is not None and not buffer.loading:
+            group = buffer.undo_log.redo()
+            if group:
+                self._replay_group(buffer, group, undo=False)
+        return "break"
+
+    def _replay_group(self, buffer, group, undo):
+        """撤销（逆序反向执行）或重做（顺序执行）一个步骤，光标移到最后修改的位置"""
+        widget = buffer.widget
+        self._replaying = True
+        try:
+            for kind, line, column, text in (reversed(group) if undo else group):
+                start = f"{line}.{column}"
+                end = "%d.%d" % _text_end(line, column, text)
+                if (kind == "i") != undo:  # 重做插入 / 撤销删除
+                    widget.insert(start, text)
+                    cursor = end
+                else:
+                    widget.delete(start, end)
+                    cursor = start
         finally:
+            self._replaying = False
+        widget.tag_remove("sel", "1.0", tk.END)
+        widget.mark_set(tk.INSERT, cursor)
+        widget.see(tk.INSERT)
+
+    def _recover_journals(self):
+        """启动时检查上次异常退出残留的恢复日志，询问是否恢复未保存的修改"""
+        orphans = EditJournal.orphans()
+        recoverable = [(header, ops) for path, header, ops in orphans if header and ops]
+        if recoverable:
+            names = "、".join(os.path.basename(header["path"]) if header.get("path") else "未命名文件"
+                             for header, ops in recoverable)
+            if messagebox.askyesno("恢复未保存的修改", f"检测到上次异常退出时未保存的修改：\n{names}\n\n是否恢复？"):
+                for header, ops in recoverable:
+                    self._restore_journal(header, ops)
+        for path, header, ops in orphans:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _restore_journal(self, header, ops):
+        """以日志记录的基准内容打开文件，再依次重放修改"""
+        path = header.get("path")
+        if path and header.get("size") is not None:
+            try:
+                stat = os.stat(path)
+                if (stat.st_size, stat.st_mtime_ns) != (header["size"], header["mtime_ns"]):
+                    raise OSError("文件在上次退出后已被修改")
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                self.console_insert(f"⚠️  无法恢复 {path}：{e}\n", is_error=True)
+                return
+            buffer = self._find_buffer(path) or self._open_buffer(path, content, large=len(content) > self.LARGE_FILE_BYTES)
+        else:
+            buffer = self._create_buffer(path)  # 未命名文件（或尚未写入磁盘的新文件）以空内容为基准
+        self._activate_buffer(buffer)
+        widget = buffer.widget
+        try:
+            for op in ops:
+                if op[0] == "i":
+                    widget.insert(f"{op[1]}.{op[2]}", op[3])
+                elif op[0] == "d":
+                    widget.delete(f"{op[1]}.{op[2]}", f"{op[3]}.{op[4]}")
+                else:
+                    widget.delete("1.0", tk.END)
+                    widget.insert("1.0", op[1])
+        except (tk.TclError, IndexError) as e:
+            self.console_insert(f"⚠️  {buffer.name} 的恢复日志已损坏，只恢复了部分修改：{e}\n", is_error=True)
+            return
+        self.console_insert(f"♻️  已恢复 {buffer.name} 的 {len(ops)} 处未保存修改\n")
+
+    # ========== 后台语法检查：修改停止后在后台编译，结果以下划线和行号栏标记显示 ==========
+    CHECK_DELAY_MS = 500          # 停止输入多久后开始检查
+    CHECK_LARGE_DELAY_MS = 2000   # 大文件模式下的检查延迟
+    CHECK_MAX_MARKS = 500         # 最多标记的诊断数
+
+    def _schedule_check(self, buffer):
+        """重新安排检查：等待中的检查推迟，进行中的检查作废（结果不再显示）"""
+        if buffer.check_job is not None:
+            self.root.after_cancel(buffer.check_job)
+        buffer.check_generation += 1
+        if buffer.check_future is not None:
+            buffer.check_future.cancel()  # 尚未开始的直接取消
+            buffer.check_future = None
+        delay = self.CHECK_LARGE_DELAY_MS if buffer.large else self.CHECK_DELAY_MS
+        buffer.check_job = self.root.after(delay, self._start_check, buffer)
+
+    def _start_check(self, buffer):
+        buffer.check_job = None
+        if buffer.widget is None or buffer.loading:
+            return
+        if buffer.path and not buffer.path.endswith((".py", ".pyw")):
+            return
+        source = buffer.widget.get("1.0", "end-1c")
+        filename = buffer.path or "untitled.py"
+        generation = buffer.check_generation
+        pool = self._check_process_pool() if len(source) > SyntaxChecker.PROCESS_CHARS else None
+
+        def done(diagnostics, error):
+            if generation != buffer.check_generation or error is not None or buffer.widget is None:
+                return
+            buffer.check_future = None
+            self._show_diagnostics(buffer, diagnostics)
+
+        buffer.check_future = self._run_in_background(lambda: self.checker.check(source, filename, pool), done)
+
+    def _check_process_pool(self):
+        """大文件检查用的子进程池（首次使用时创建）；打包后的程序无法可靠地启动子进程，退回线程内检查"""
+        if self._check_pool is None and not getattr(sys, "frozen", False):
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # 不用 fork：编辑器进程中已有多个后台线程，fork 时若有线程持有锁（如导入锁），子进程会死锁
+            self._check_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return self._check_pool
+
+    def _show_diagnostics(self, buffer, diagnostics):
+        """用下划线标记诊断位置，并在行号栏显示标记"""
+        widget = buffer.widget
+        widget.tag_remove("lint_error", "1.0", tk.END)
+        widget.tag_remove("lint_warning", "1.0", tk.END)
+        buffer.diagnostics = {}
+        for line, column, end, severity, message in diagnostics[:self.CHECK_MAX_MARKS]:
+            start = f"{line}.{column}"
+            if widget.compare(start, ">=", f"{line}.0 lineend"):
+                start = f"{line}.0 lineend -1c"  # 错误位于行尾（如缺少右括号）时标记最后一个字符
+            widget.tag_add(f"lint_{severity}", start, f"{line}.{end}" if end else f"{start} wordend")
+            buffer.diagnostics.setdefault(line, (severity, message))
+        if buffer is self.buffer:
+            self.gutter.set_markers(buffer.diagnostics)
+
+    def _show_diagnostic_at(self, buffer, event):
+        """鼠标移到下划线上时在状态栏显示诊断信息"""
+        line = int(buffer.widget.index(f"@{event.x},{event.y}").split(".")[0])
+        if line in buffer.diagnostics:
+            severity, message = buffer.diagnostics[line]
+            self.status_bar.config(text=f"{'❌ 语法错误' if severity == 'error' else '⚠️  警告'}（第 {line} 行）：{message}")
+
+    # ========== 持久内核：保留导入与变量，按单元格（# %%）增量运行 ==========
+    def run_changed_cells(self):
+        """持久内核模式下的运行：只发送自上次成功执行后修改过的单元格"""
+        cells = _split_cells(self.editor.get("1.0", "end-1c"))
+        executed = self._kernel_cells.setdefault(self.buffer, {})
+        jobs = [(line, source, index) for index, (line, source) in enumerate(cells)
+                if source.strip() and executed.get(index) != source]
+        if not jobs:
+            self.console_insert("ℹ️  所有单元格均未修改（Ctrl+Enter 重新运行当前单元格，重启内核后全部重新运行）\n")
+            return
+        self._kernel_submit(jobs)
+
+    def run_current_cell(self):
+        """运行光标所在的单元格（Ctrl+Enter）"""
+        cursor = int(self.editor.index(tk.INSERT).split(".")[0])
+        cells = _split_cells(self.editor.get("1.0", "end-1c"))
+        index = max(i for i, (line, source) in enumerate(cells) if line <= cursor)
+        line, source = cells[index]
+        if source.strip():
+            self._kernel_submit([(line, source, index)])
+        return "break"
+
+    def run_selection(self):
+        """在内核中运行选中的代码（F9）；没有选中内容时运行光标所在行"""
+        try:
+            first, last = self.editor.index(tk.SEL_FIRST), self.editor.index(tk.SEL_LAST)
+        except tk.TclError:
+            first, last = self.editor.index("insert linestart"), self.editor.index("insert lineend")
+        source = textwrap.dedent(self.editor.get(f"{first} linestart", last))
+        if source.strip():
+            self._kernel_submit([(int(first.split(".")[0]), source, None)])
+        return "break"
+
+    def restart_kernel(self):
+        """重启持久内核：清空所有导入的模块与变量"""
+        self._kernel_jobs = []
+        self._kernel_cells.clear()
+        if self.kernel.running:
+            self.kernel.stop()
+        if not self.runner.running:
+            self.stop_btn.config(state=tk.DISABLED)
+        self.console_insert("🔄 内核已重启，下次运行将重新执行所有单元格\n")
+
+    def _kernel_submit(self, jobs):
+        if self._still_loading("运行"):
+            return
+        if self.kernel.busy or self._kernel_jobs:
+            self.console_insert("⚠️  内核正在运行代码，请等待结束或停止（Shift+F5）\n", is_error=True)
+            return
+        buffer = self.buffer
+        filename = os.path.abspath(self.current_file) if self.current_file else "untitled.py"
+        cwd = os.path.dirname(filename) if self.current_file else None
+        full = self.editor.get("1.0", "end-1c")
+        started = self.kernel.running
+        self._kernel_jobs = [(buffer, index, line, source, filename, full, cwd) for line, source, index in jobs]
+        self.console_insert(f"\n{'='*50}\n【内核运行】{buffer.name}（{len(jobs)} 段代码）{'' if started else '，启动内核'}\n{'='*50}\n")
+        self.stop_btn.config(state=tk.NORMAL)
+        self._kernel_next()
+        self.root.after(self.RUN_POLL_MS, self._poll_kernel_output, set())
+
+    def _kernel_next(self):
+        """发送下一段待执行的代码"""
+        buffer, index, line, source, filename, full, cwd = self._kernel_jobs[0]
+        try:
+            self.kernel.execute(source, filename, line, full, cwd)
+        except OSError as e:
+            self.console_insert(f"❌ 无法启动内核：{e}\n", is_error=True)
+            self._kernel_jobs = []
+            self.stop_btn.config(state=tk.DISABLED)
+
+    def _poll_kernel_output(self, marks):
+        """输出内核输出；stdout 与 stderr 都收到结束标记后执行下一段代码"""
+        if not self._kernel_jobs:
+            return
+        deadline = time.perf_counter() + 0.02  # 单次最多占用主线程约20ms
+        while time.perf_counter() < deadline:
+            try:
+                stream, payload = self.kernel.queue.get_nowait()
+            except queue.Empty:
+                break
+            if stream == "exit":
+                self._kernel_jobs = []
+                self._kernel_cells.clear()
+                self.stop_btn.config(state=tk.DISABLED)
+                self.console_insert(f"\n❌ 内核已退出（退出码：{payload[0]}），变量与导入的模块已丢失\n", is_error=True)
+                return
+            if stream != "mark":
+                self.console_insert(payload, is_error=(stream == "stderr"))
+                continue
+            marks.add(payload)
+            if len(marks) < 2:
+                continue
+            status = payload[1]
+            marks.clear()
+            self.kernel.busy = False
+            buffer, index, line, source, *rest = self._kernel_jobs.pop(0)
+            elapsed = time.perf_counter() - self.kernel._started
+            if status == 0:
+                if index is not None:
+                    self._kernel_cells.setdefault(buffer, {})[index] = source
+                self.console_insert(f"✅ 第 {line} 行起的代码运行完成（{elapsed:.3f}s）\n")
+            else:
+                self.console_insert(f"❌ 第 {line} 行起的代码运行失败（{elapsed:.3f}s），后续代码未运行\n", is_error=True)
+                self._kernel_jobs = []
+            if not self._kernel_jobs:
+                self.stop_btn.config(state=tk.DISABLED)
+                self.console_insert(f"{'='*50}\n【运行结束】\n{'='*50}\n")
+                return
+            self._kernel_next()
+        self.root.after(self.RUN_POLL_MS, self._poll_kernel_output, marks)
+
+    # ========== 性能分析运行（cProfile + 可选 tracemalloc） ==========
+    PROFILE_MAX_ROWS = 500  # 热点表最多显示的函数数（按当前排序取前若干项）
+    PROFILE_COLUMNS = (("function", "函数", 160), ("ncalls", "调用次数", 70), ("tottime", "自身时间", 70),
+                       ("cumtime", "累计时间", 70), ("percall", "每次调用", 70), ("location", "位置", 160))
+
+    def profile_code(self):
+        """在 cProfile 下运行编辑区代码，结束后在控制台旁显示热点表"""
+        self.run_code(profile=True)
+
+    def _show_profile(self):
+        """读取子进程导出的统计数据并填充热点表"""
+        import pstats  # 仅在性能分析时才需要
+        try:
+            stats = pstats.Stats(self._profile["path"])
+        except (OSError, EOFError, TypeError, ValueError):
+            self.console_insert("⚠️  没有生成性能分析数据（进程被终止？）\n", is_error=True)
+            return
+        rows = []
+        for (file, line, name), (cc, nc, tt, ct, callers) in stats.stats.items():
+            calls = str(nc) if cc == nc else f"{nc}/{cc}"  # 含递归调用时显示 总次数/原始调用次数
+            location = f"{os.path.basename(file)}:{line}" if file != "~" else "内置"
+            rows.append((name, calls, tt, ct, ct / cc if cc else 0.0, location, file, line, nc))
+        self._profile["rows"] = rows
+        self._profile["sort"] = ("cumtime", True)
+        self.profile_frame.pack(side=tk.RIGHT, fill=tk.Y, before=self.console_scroll)
+        self._fill_profile_table()
+        self.console_insert(f"📊 性能分析：{len(rows)} 个函数，共 {stats.total_calls} 次调用，"
+                            f"{stats.total_tt:.3f}s（点击表头排序，点击函数跳转到定义）\n")
+
+    def _sort_profile(self, column):
+        """点击表头排序：同一列再次点击时反转顺序"""
+        if not self._profile or not self._profile.get("rows"):
+            return
+        current, descending = self._profile["sort"]
+        self._profile["sort"] = (column, not descending if column == current else column not in ("function", "location"))
+        self._fill_profile_table()
+
+    def _fill_profile_table(self):
+        column, descending = self._profile["sort"]
+        key = {"function": lambda r: r[0].lower(), "ncalls": lambda r: r[8], "tottime": lambda r: r[2],
+               "cumtime": lambda r: r[3], "percall": lambda r: r[4], "location": lambda r: (r[6], r[7])}[column]
+        rows = sorted(self._profile["rows"], key=key, reverse=descending)[:self.PROFILE_MAX_ROWS]
+        table = self.profile_table
+        table.delete(*table.get_children())
+        for i, (name, calls, tt, ct, percall, location, file, line, nc) in enumerate(rows):
+            table.insert("", tk.END, iid=str(i), values=(name, calls, f"{tt:.4f}", f"{ct:.4f}", f"{percall:.6f}", location))
+        self._profile["shown"] = rows
+
+    def _on_profile_select(self, event=None):
+        """跳转到选中函数的定义行；本次运行的代码跳到运行时的标签页（未保存的文件也可以）"""
+        selection = self.profile_table.selection()
+        if not selection or not self._profile or "shown" not in self._profile:
+            return
+        row = self._profile["shown"][int(selection[0])]
+        file, line = row[6], row[7]
+        buffer = self._profile["buffer"]
+        if file == self._profile["filename"] and buffer in self.buffers:
+            self._activate_buffer(buffer)
+            self._goto_line(line)
+        elif os.path.isfile(file):
+            self._open_location(file, line)
+
+    def export_profile(self):
+        """导出最近一次性能分析结果（可用 pstats / snakeviz 等工具查看）"""
+        if not self._profile or "rows" not in self._profile:  # 新的性能分析运行尚未结束时没有可导出的结果
+            messagebox.showinfo("导出性能分析结果", "请先使用“性能分析运行”（Ctrl+F5）运行代码")
+            return
+        file_path = filedialog.asksaveasfilename(
+            title="导出性能分析结果",
+            defaultextension=".prof",
+            filetypes=[("cProfile结果", "*.prof *.pstats"), ("所有文件", "*.*")]
+        )
+        if file_path:
+            try:
+                shutil.copyfile(self._profile["path"], file_path)
+                messagebox.showinfo("导出成功", f"已保存至：\n{file_path}")
+            except Exception as e:
+                messagebox.showerror("导出失败", f"错误：{str(e)}")
+
+    def hide_profile(self):
+        self.profile_frame.pack_forget()
+
+    def _discard_profile(self):
+        """丢弃上一次的性能分析结果：清空并隐藏热点表，删除统计文件"""
+        if self.console is not None:  # 热点表与控制台一起在首帧之后创建
+            self.profile_table.delete(*self.profile_table.get_children())
+            self.profile_frame.pack_forget()
+        if self._profile:
+            try:
+                os.remove(self._profile["path"])
+            except OSError:
+                pass
+            self._profile = None
+
+    # ========== 核心功能：运行代码 + 控制台操作 ==========
+    RUN_POLL_MS = 30  # 运行输出队列的轮询间隔
+
+    def run_code(self, profile=False):
+        """在独立子进程中运行编辑区的Python代码，输出实时流入控制台（优化：不再阻塞界面）
+
+        profile 为真时在 cProfile 下运行（见“性能分析运行”）；开启持久内核模式时改为在内核中运行修改过的单元格。
+        """
+        if self._still_loading("运行"):
+            return
+        if self.kernel_mode_var.get() and not profile:
+            self.run_changed_cells()
+            return
+        if self.runner.running:
+            self.console_insert("⚠️  已有代码正在运行，请先停止（Shift+F5）\n", is_error=True)
+            return
+        file_name = os.path.basename(self.current_file) if self.current_file else "未命名文件"
+        self.console_insert(f"\n{'='*50}\n【运行开始】{file_name}\n{'='*50}\n")
+        code = self.editor.get("1.0", "end-1c")
+        if not code.strip():
+            self.console_insert("⚠️  错误：编辑区无代码可运行！\n", is_error=True)
+            self.console_insert(f"{'='*50}\n【运行结束】\n{'='*50}\n")
+            return
+        filename = os.path.abspath(self.current_file) if self.current_file else "untitled.py"
+        cwd = os.path.dirname(filename) if self.current_file else None
+        profile_path = None
+        if profile:
+            self._discard_profile()
+            fd, profile_path = tempfile.mkstemp(prefix="hcode_prof_", suffix=".prof")
+            os.close(fd)
+            self._profile = {"path": profile_path, "filename": filename, "buffer": self.buffer, "pending": True}
+        try:
+            self.runner.start(code, filename, cwd, profile_path,
+                              trace_memory=profile and self.trace_memory_var.get())
+        except OSError as e:
+            self.console_insert(f"❌ 无法启动Python解释器：{e}\n", is_error=True)
             self.console_insert(f"{'='*50}\n【运行结束】\n{'='*50}\n")
+            return
+        self.stop_btn.config(state=tk.NORMAL)
+        self.root.after(self.RUN_POLL_MS, self._poll_run_output)
+
+    def stop_code(self):
+        """终止正在运行的代码；持久内核中的代码只中断执行，保留内核状态"""
+        if self.runner.running:
+            self.runner.stop()
+            self.console_insert("\n⏹  已手动终止运行\n", is_error=True)
+        if self.kernel.busy:
+            self._kernel_jobs[1:] = []
+            self.kernel.interrupt()
+            self.console_insert("\n⏹  已中断内核中的代码\n", is_error=True)
+
+    def _poll_run_output(self):
+        """把子进程输出从队列取出写入控制台；进程结束后输出统计信息"""
+        deadline = time.perf_counter() + 0.02  # 单次最多占用主线程约20ms
+        while time.perf_counter() < deadline:
+            try:
+                stream, payload = self.runner.queue.get_nowait()
+            except queue.Empty:
+                break
+            if stream == "exit":
+                self._finish_run(*payload)
+                return
+            self.console_insert(payload, is_error=(stream == "stderr"))
+        self.root.after(self.RUN_POLL_MS, self._poll_run_output)
+
+    def _finish_run(self, returncode, stats):
+        self.stop_btn.config(state=tk.DISABLED)
+        if returncode == 0:
+            self.console_insert("\n✅ 运行成功！无报错信息\n")
+        else:
+            self.console_insert(f"\n❌ 运行失败，进程退出码：{returncode}\n", is_error=True)
+        cpu = f"{stats['cpu']:.3f}s" if stats["cpu"] is not None else "不可用"
+        rss = f"{stats['peak_rss'] / 1048576:.1f} MB" if stats["peak_rss"] is not None else "不可用"
+        self.console_insert(f"⏱  耗时：{stats['wall']:.3f}s | CPU时间：{cpu} | 峰值内存：{rss}\n")
+        if self._profile and self._profile.pop("pending", False):
+            self._show_profile()
+        self.console_insert(f"{'='*50}\n【运行结束】\n{'='*50}\n")
 
     def clear_console(self):
         """清空控制台所有内容"""
-        self.console.config(state=tk.NORMAL)
-        self.console.delete("1.0", tk.END)
-        self.console.config(state=tk.DISABLED)
+        self.console_sink.clear()
         self.console_insert("✅ 控制台已清空\n")
 
     def console_insert(self, text, is_error=False):
-        """控制台插入文本：普通绿色，错误红色，自动滚动"""
-        self.console.config(state=tk.NORMAL)
-        if is_error:
-            self.console.insert(tk.END, text, "error")
-        else:
-            self.console.insert(tk.END, text)
-        self.console.config(state=tk.DISABLED)
-        self.console.yview(tk.END)
+        """控制台插入文本：普通绿色，错误红色（优化：先缓冲，批量刷新并自动滚动）"""
+        self.console_sink.write(text, "error" if is_error else None)
+
+    def save_console_output(self):
+        """把控制台完整输出（含已裁剪的旧行）保存到文件"""
+        file_path = filedialog.asksaveasfilename(
+            title="保存控制台输出",
+            defaultextension=".txt",
+            filetypes=[("文本文件", "*.txt"), ("所有文件", "*.*")]
+        )
+        if file_path:
+            try:
+                self.console_sink.save(file_path)
+                messagebox.showinfo("保存成功", f"已保存至：\n{file_path}")
+            except Exception as e:
+                messagebox.showerror("保存失败", f"错误：{str(e)}")
 
     def _on_close(self):
-        """关闭窗口：恢复标准输出，防止Python环境异常（保持原有逻辑）"""
-        if self._check_unsaved():
+        """关闭窗口：检查所有标签页的未保存内容，恢复标准输出，防止Python环境异常"""
+        modified = "、".join(buffer.name for buffer in self.buffers if buffer.is_modified)
+        if modified:
+            result = messagebox.askyesnocancel("未保存的更改", f"以下文件有未保存内容，是否放弃更改？\n{modified}")
+            if not result:
+                return
+        self.runner.stop()
+        self.kernel.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self._check_pool is not None:
+            self._check_pool.shutdown(wait=False, cancel_futures=True)
+        self._discard_profile()
+        for buffer in self.buffers:
+            buffer.discard_snapshot()
+            buffer.journal.discard()
+        sys.stdout = sys.__stdout__
+        sys.stderr = sys.__stderr__
+        self.root.destroy()
+
+# ========== 性能基准测试（无界面运行：Xvfb 或隐藏的 Tk 根窗口） ==========
+# 用法：python Hcode.py --bench [输出文件]；结果为JSON，可在不同提交之间对比。
+# 没有图形环境时可用 xvfb-run 运行；默认隐藏主窗口，--bench-window 保留窗口以获得真实的可见区域尺寸。
+_BENCH_SAMPLE = '''\
+@decorator(option=True)
+def function_{n}(value, *args, **kwargs):
+    """文档字符串 {n}"""
+    result = [len(str(item)) for item in range(value) if item % 3 == 0]  # 注释
+    text = f"value={{value!r}} total={{sum(result) + 0x1F}}"
+    if isinstance(value, int) and value > 1.5e3:
+        return print(text, 'single', r"raw\\d+")
+    return None
+
+'''
+
+
+def _bench_source(lines):
+    """生成指定行数的合成Python代码（覆盖关键字/内置函数/装饰器/字符串/f-string/注释/数字）"""
+    block = _BENCH_SAMPLE.count("\n")
+    return "".join(_BENCH_SAMPLE.format(n=n) for n in range(lines // block + 1)).split("\n", lines)[:lines]
+
+
+def _percentiles(samples):
+    """单项操作的耗时统计（毫秒）"""
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+    return {"count": len(ordered), "mean": sum(ordered) / len(ordered) * 1000,
+            "p50": pick(50), "p90": pick(90), "p99": pick(99), "max": ordered[-1] * 1000}
+
+
+def _peak_rss_mb():
+    """进程峰值常驻内存（MB）；不支持 resource 模块的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1048576 if sys.platform == "darwin" else peak / 1024  # macOS 单位为字节，Linux 为KB
+
+
+class EditorBenchmark:
+    """驱动 HCodeEditorWithRun 执行合成负载，记录各操作耗时分布与峰值内存
+
+    每项操作的计时包含它引发的同步工作：编辑修改立即分发（不计 EditScheduler 的防抖等待），
+    再处理空闲任务（语法高亮、行号重绘、滚动同步）。
+    """
+
+    SIZES = (1000, 10000, 100000)
+    TYPING_CHARS = 300
+    PASTE_LINES = 2000
+    PASTE_TIMES = 5
+    SCROLL_JUMPS = 50
+    SAVE_TIMES = 5
+    PRINT_LINES = 100000
+    PRINT_BATCH = 1000
+
+    def __init__(self, sizes=SIZES, show_window=False):
+        self.sizes = sizes
+        self.root = tk.Tk()
+        if not show_window:
+            self.root.withdraw()
+        self.app = HCodeEditorWithRun(self.root, recover=False)
+        self.root.update()
+        self.app._init_deferred()  # 显示窗口时可能仍在等首帧，测量前先完成延迟初始化（已完成时不重复执行）
+        self.samples = {}
+        self.tmpdir = tempfile.mkdtemp(prefix="hcode-bench-")
+
+    def _record(self, name, seconds):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def _settle(self, timeout=60):
+        """处理事件循环直到没有待执行的防抖/高亮/控制台刷新任务"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            self.root.update()
+            app = self.app
+            if app.edit_scheduler._job is None and app.highlighter._job is None and app.console_sink._job is None:
+                return
+            time.sleep(0.001)
+
+    def _edit(self, func):
+        """执行一次编辑并计时到相关更新全部完成"""
+        start = time.perf_counter()
+        func()
+        self.app.edit_scheduler.flush()
+        self.root.update_idletasks()
+        elapsed = time.perf_counter() - start
+        self.root.update()
+        return elapsed
+
+    def bench_file(self, lines):
+        app = self.app
+        prefix = f"{lines}."
+        path = os.path.join(self.tmpdir, f"bench_{lines}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(_bench_source(lines)))
+        # 打开文件：到首屏显示为止 / 到后台高亮全部完成为止
+        start = time.perf_counter()
+        app._load_file(path)
+        self.root.update()
+        self._record(prefix + "open_file", time.perf_counter() - start)
+        self._settle()
+        self._record(prefix + "highlight_full", time.perf_counter() - start)
+        editor = app.editor
+        # 连续输入：在文件中部逐字符输入，每20个字符换行
+        editor.mark_set(tk.INSERT, f"{lines // 2}.0")
+        editor.see(tk.INSERT)
+        self._settle()
+        for i in range(self.TYPING_CHARS):
+            char = "\n" if i % 20 == 19 else "abc_ (\"'#"[i % 9]
+            self._record(prefix + "typing", self._edit(lambda: editor.insert(tk.INSERT, char)))
+        # 大段粘贴
+        block = "\n".join(_bench_source(self.PASTE_LINES)) + "\n"
+        for _ in range(self.PASTE_TIMES):
+            self._record(prefix + "paste", self._edit(lambda: editor.insert(tk.INSERT, block)))
+        self._settle()
+        # 滚动：跳转到文件的不同位置（行号重绘 + 可见区域高亮）
+        for i in range(self.SCROLL_JUMPS):
+            start = time.perf_counter()
+            editor.yview_moveto((i * 7919 % self.SCROLL_JUMPS) / self.SCROLL_JUMPS)
+            self.root.update_idletasks()
+            self._record(prefix + "scroll", time.perf_counter() - start)
+            start = time.perf_counter()
+            app._update_line_numbers()
+            self._record(prefix + "update_line_numbers", time.perf_counter() - start)
+        # 保存（不弹出保存成功提示框）
+        showinfo, messagebox.showinfo = messagebox.showinfo, lambda *args, **kwargs: None
+        try:
+            for _ in range(self.SAVE_TIMES):
+                editor.insert(tk.END, "#")
+                self._settle()
+                start = time.perf_counter()
+                app.save_file()
+                while app.buffer.is_modified:  # 大文件在后台线程保存，等待完成
+                    self.root.update()
+                    time.sleep(0.001)
+                self._record(prefix + "save_file", time.perf_counter() - start)
+        finally:
+            messagebox.showinfo = showinfo
+        app.buffer.is_modified = False
+        app.close_buffer()
+        self._settle()
+
+    def bench_console(self):
+        """大量 print：按批计时写入（仅缓冲），再单独计时刷新到控制台"""
+        app = self.app
+        app.clear_console()
+        self._settle()
+        for batch in range(self.PRINT_LINES // self.PRINT_BATCH):
+            start = time.perf_counter()
+            for i in range(self.PRINT_BATCH):
+                print(f"[{batch}] 输出第 {i} 行：{'x' * (i % 60)}")
+            self._record("console.print_1k_lines", time.perf_counter() - start)
+            start = time.perf_counter()
+            app.console_sink.flush()
+            self.root.update_idletasks()
+            self._record("console.flush", time.perf_counter() - start)
+        for i in range(self.PRINT_BATCH):
+            start = time.perf_counter()
+            app.console_insert(f"console_insert {i}\n", is_error=(i % 2 == 0))
+            self._record("console.console_insert", time.perf_counter() - start)
+        self._settle()
+
+    def run(self):
+        report = {
+            "python": sys.version.split()[0],
+            "tk": self.root.tk.call("info", "patchlevel"),
+            "platform": sys.platform,
+            "sizes": list(self.sizes),
+            "peak_rss_mb": {},
+        }
+        try:
+            self._settle()
+            for lines in self.sizes:
+                self.bench_file(lines)
+                report["peak_rss_mb"][str(lines)] = _peak_rss_mb()
+            self.bench_console()
+            report["peak_rss_mb"]["console"] = _peak_rss_mb()
+        finally:
+            self.app.runner.stop()
+            self.app.executor.shutdown(wait=False)
             sys.stdout = sys.__stdout__
             sys.stderr = sys.__stderr__
             self.root.destroy()
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+        report["operations"] = {name: _percentiles(values) for name, values in sorted(self.samples.items())}
+        return report
+
+
+# ========== 命令行批处理（--run / --check）：不创建Tk组件，多个文件并行处理 ==========
+def _batch_check(path):
+    """检查单个文件的语法（在子进程中执行），返回结果字典"""
+    started = time.perf_counter()
+    try:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        diagnostics = _check_source(source, path)
+    except (OSError, UnicodeDecodeError) as e:
+        diagnostics = [(1, 0, None, "error", f"无法读取：{e}")]
+    return {
+        "path": path,
+        "ok": not any(level == "error" for _, _, _, level, _ in diagnostics),
+        "seconds": time.perf_counter() - started,
+        "diagnostics": [{"line": line, "column": column + 1, "level": level, "message": message}
+                        for line, column, _, level, message in diagnostics],
+    }
+
+
+def _batch_run(path, timeout=None):
+    """用 CodeRunner 在独立进程中运行单个文件（工作目录为文件所在目录），收集输出、退出码与资源统计"""
+    started = time.perf_counter()
+    try:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {"path": path, "ok": False, "returncode": None, "seconds": time.perf_counter() - started,
+                "cpu": None, "peak_rss": None, "timed_out": False, "output": f"无法读取：{e}\n"}
+    runner = CodeRunner()
+    runner.start(source, path, cwd=os.path.dirname(path))
+    output, timed_out = [], False
+    while True:
+        remaining = None if timeout is None else started + timeout - time.perf_counter()
+        try:
+            kind, payload = runner.queue.get(timeout=remaining if remaining is None or remaining > 0 else 0)
+        except queue.Empty:
+            if runner.running:  # 超时：结束子进程，随后仍会收到 exit
+                runner.stop()
+                timed_out = True
+            timeout = None  # 进程已结束、只是在等读取线程时不算超时
+            continue
+        if kind == "exit":
+            returncode, stats = payload
+            break
+        output.append(payload)
+    return {"path": path, "ok": returncode == 0 and not timed_out, "returncode": returncode,
+            "seconds": stats["wall"], "cpu": stats["cpu"], "peak_rss": stats["peak_rss"],
+            "timed_out": timed_out, "output": "".join(output)}
+
+
+class BatchRunner:
+    """批量运行/检查文件并输出汇总报告
+
+    --check 在进程池中执行（compile 全程持有GIL，多进程才能并行）；--run 的每个文件本身就在独立子进程中运行，
+    由线程池等待各子进程，同时运行的进程数同样不超过 jobs。
+    """
+
+    def __init__(self, mode, jobs=None, timeout=None, verbose=False, out=None):
+        self.mode = mode  # "run" 或 "check"
+        self.jobs = jobs or os.cpu_count() or 1
+        self.timeout = timeout
+        self.verbose = verbose
+        self.out = out or sys.stdout
+
+    def collect(self, paths):
+        """展开命令行参数：文件夹按工作区忽略规则递归收集 .py 文件，直接指定的文件总是包含；去重并保持顺序"""
+        files = {}
+        for path in paths:
+            path = os.path.abspath(path)
+            if not os.path.isdir(path):
+                files[path] = None
+                continue
+            scanner = WorkspaceScanner(path)
+            pending = [path]
+            while pending:
+                try:
+                    entries = scanner.list_dir(pending.pop())
+                except OSError:
+                    continue
+                for name, child, is_dir in reversed(entries):
+                    if is_dir:
+                        pending.append(child)
+                    elif name.endswith(".py"):
+                        files[child] = None
+        return list(files)
+
+    def run(self, files):
+        """并行处理所有文件，每完成一个立即输出一行；返回按输入顺序排列的结果列表"""
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+        if self.mode == "check":
+            pool = ProcessPoolExecutor(max_workers=min(self.jobs, len(files)) or 1)
+            futures = {pool.submit(_batch_check, path): index for index, path in enumerate(files)}
+        else:
+            pool = ThreadPoolExecutor(max_workers=min(self.jobs, len(files)) or 1)
+            futures = {pool.submit(_batch_run, path, self.timeout): index for index, path in enumerate(files)}
+        results = [None] * len(files)
+        with pool:
+            for future in as_completed(futures):
+                result = results[futures[future]] = future.result()
+                self._print_result(result)
+        return results
+
+    @staticmethod
+    def _status(result):
+        if result.get("timed_out"):
+            return "超时"
+        return "通过" if result["ok"] else "失败"
+
+    def _print_result(self, result):
+        print(f"[{self._status(result)}] {result['seconds']:8.3f}s  {result['path']}", file=self.out)
+        for item in result.get("diagnostics", ()):
+            print(f"    {result['path']}:{item['line']}:{item['column']}: {item['level']}: {item['message']}",
+                  file=self.out)
+        if result.get("output") and (self.verbose or not result["ok"]):
+            print(textwrap.indent(result["output"].rstrip("\n"), "    | "), file=self.out)
+
+    def report(self, results, elapsed):
+        """汇总报告：按耗时从高到低列出每个文件，最后给出总数与总耗时；返回可写入JSON的字典"""
+        failed = [r for r in results if not r["ok"]]
+        total = sum(r["seconds"] for r in results)
+        print(f"\n{'耗时(s)':>9}  {'CPU(s)':>8}  {'内存(MB)':>8}  状态  文件", file=self.out)
+        for r in sorted(results, key=lambda r: r["seconds"], reverse=True):
+            cpu = f"{r['cpu']:8.3f}" if r.get("cpu") is not None else f"{'-':>8}"
+            rss = f"{r['peak_rss'] / 1048576:8.1f}" if r.get("peak_rss") is not None else f"{'-':>8}"
+            print(f"{r['seconds']:9.3f}  {cpu}  {rss}  {self._status(r)}  {r['path']}", file=self.out)
+        print(f"\n共 {len(results)} 个文件：{len(results) - len(failed)} 个通过，{len(failed)} 个失败 | "
+              f"总耗时 {elapsed:.3f}s（逐个累计 {total:.3f}s，并行数 {self.jobs}）", file=self.out)
+        return {"mode": self.mode, "jobs": self.jobs, "elapsed": elapsed, "files": results,
+                "passed": len(results) - len(failed), "failed": len(failed)}
+
+
+def _parse_args(argv):
+    import argparse  # 延迟导入（只在解析命令行时需要）
+    parser = argparse.ArgumentParser(
+        prog="Hcode", description="Hcode Python编辑器：不带 --run/--check 时打开图形界面，并在其中打开指定的文件/文件夹")
+    parser.add_argument("paths", nargs="*", help="要打开（或批量运行/检查）的文件或文件夹")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--run", action="store_true", help="不打开界面，在独立进程中运行所有文件并输出汇总报告")
+    mode.add_argument("--check", action="store_true", help="不打开界面，检查所有文件的语法（安装了 pyflakes 时一并检查）")
+    mode.add_argument("--bench", nargs="?", const="", metavar="输出文件", help="运行性能基准测试，输出JSON报告")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行数（默认CPU核数）")
+    parser.add_argument("--timeout", type=float, default=None, help="--run 时单个文件的超时秒数")
+    parser.add_argument("-v", "--verbose", action="store_true", help="--run 时也输出成功文件的输出内容")
+    parser.add_argument("--report", metavar="输出文件", help="把批处理结果另存为JSON")
+    parser.add_argument("--bench-window", action="store_true", help="基准测试时显示窗口")
+    parser.add_argument("--startup-profile", action="store_true", help="启动后输出各阶段耗时")
+    args = parser.parse_args(argv)
+    if (args.run or args.check) and not args.paths:
+        parser.error("--run/--check 需要至少一个文件或文件夹")
+    return args
+
+
+def _main_batch(args):
+    runner = BatchRunner("run" if args.run else "check", args.jobs, args.timeout, args.verbose)
+    files = runner.collect(args.paths)
+    if not files:
+        print("没有找到要处理的 .py 文件", file=sys.stderr)
+        return 2
+    started = time.perf_counter()
+    results = runner.run(files)
+    report = runner.report(results, time.perf_counter() - started)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["failed"] else 0
+
+
+class StartupTimer:
+    """启动计时（--startup-profile）：记录各阶段耗时，启动完成后输出到终端"""
+
+    def __init__(self, started):
+        self.started = self._last = started
+        self.phases = []
+
+    def mark(self, phase):
+        """结束一个阶段（从上一个阶段结束时算起）"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        lines = ["启动耗时（--startup-profile）："]
+        lines += [f"  {phase}：{seconds * 1000:.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"  合计：{(self._last - self.started) * 1000:.1f} ms")
+        print("\n".join(lines), file=sys.__stdout__, flush=True)  # 控制台重定向后仍输出到终端
+
 
 # 程序入口：全局异常捕获，确保100%能启动
 if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()  # 打包后进程池（语法检查/批处理）的子进程从这里进入
+    args = _parse_args(sys.argv[1:])
+    if args.run or args.check:
+        # 批处理：python Hcode.py --run|--check 文件或文件夹... [-j 并行数] [--timeout 秒] [--report 输出文件]
+        sys.exit(_main_batch(args))
+    if args.bench is not None:
+        # 性能基准测试：python Hcode.py --bench [输出文件] [--bench-window]
+        report = json.dumps(EditorBenchmark(show_window=args.bench_window).run(), indent=2)
+        if args.bench:
+            with open(args.bench, "w", encoding="utf-8") as f:
+                f.write(report)
+        else:
+            print(report)
+        sys.exit(0)
+    # --startup-profile：输出 导入模块 / Tk初始化 / 界面构建 / 首帧绘制 / 延迟初始化 各阶段耗时
+    startup_timer = StartupTimer(_IMPORT_STARTED) if args.startup_profile else None
+    if startup_timer is not None:
+        startup_timer.mark("导入模块")
     try:
         root = tk.Tk()
         # 新增：跨平台中文兼容，解决Tkinter中文显示乱码问题
@@ -445,7 +3746,9 @@ if __name__ == "__main__":
             root.option_add("*Font", "SimHei 10")  # Windows中文
         else:
             root.option_add("*Font", "WenQuanYi Zen Hei 10")  # Linux/Mac中文
-        app = HCodeEditorWithRun(root)
+        if startup_timer is not None:
+            startup_timer.mark("Tk初始化")
+        app = HCodeEditorWithRun(root, startup_timer=startup_timer, paths=args.paths)
         root.mainloop()
     except Exception as e:
         messagebox.showerror("启动失败", f"编辑器启动出错：\n{str(e)}\n\n错误详情：\n{traceback.format_exc()}")